@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+摄像头能力档案
+保存摄像头支持的分辨率、参数范围和最佳设置，避免每次拍照都重新探测
+"""
+
+import json
+import os
+from datetime import datetime
+
+import cv2
+
+from timelapse_core import logger
+
+# 默认档案缓存文件
+DEFAULT_PROFILE_PATH = "camera_profile.json"
+
+# 候选分辨率（从高到低）
+CANDIDATE_RESOLUTIONS = [
+    (3840, 2160),  # 4K
+    (2560, 1440),  # 2K
+    (1920, 1080),  # 1080p
+    (1280, 720),   # 720p
+    (640, 480),    # VGA
+]
+
+# 拍照时的期望设置（属性名 -> 期望值），只有摄像头支持的才会被应用
+DESIRED_SETTINGS = {
+    "BUFFERSIZE": 1,     # 减少缓冲区延迟
+    "FPS": 30,           # 适中帧率
+    "BRIGHTNESS": 128,   # 保持默认亮度
+    "CONTRAST": 140,     # 稍微提高对比度
+    "SATURATION": 145,   # 稍微提高饱和度
+    "SHARPNESS": 140,    # 提高锐度
+    "AUTO_WB": 1,        # 启用自动白平衡
+    "AUTOFOCUS": 1,      # 启用自动对焦
+}
+
+# 需要探测取值范围的连续参数
+RANGE_PROPERTIES = ["BRIGHTNESS", "CONTRAST", "SATURATION", "SHARPNESS", "GAIN", "EXPOSURE"]
+
+
+def prop_id(name):
+    """属性名转换为OpenCV属性常量，如 "BRIGHTNESS" -> cv2.CAP_PROP_BRIGHTNESS"""
+    return getattr(cv2, f"CAP_PROP_{name}")
+
+
+def device_key(camera_index):
+    """档案缓存中摄像头的键"""
+    return f"camera_{camera_index}"
+
+
+def _read_cache(path):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        logger.warning(f"摄像头档案读取失败: {e}")
+        return {}
+
+
+def load_camera_profile(camera_index=0, path=DEFAULT_PROFILE_PATH):
+    """
+    读取摄像头能力档案
+
+    Returns:
+        dict: 档案内容，不存在时返回None
+    """
+    return _read_cache(path).get(device_key(camera_index))
+
+
+def save_camera_profile(camera_index, profile, path=DEFAULT_PROFILE_PATH):
+    """
+    保存摄像头能力档案（同一文件中可保存多个摄像头）
+    """
+    cache = _read_cache(path)
+    cache[device_key(camera_index)] = profile
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, ensure_ascii=False, indent=2)
+
+
+def _probe_property(cap, name):
+    """
+    探测单个属性：是否可设置以及可设置的取值范围
+    超出范围的设置值会被驱动截断，读回的值即为边界
+    """
+    prop = prop_id(name)
+    default = cap.get(prop)
+    info = {"default": default, "settable": False}
+
+    if not cap.set(prop, default):
+        return info
+    info["settable"] = True
+
+    if name in RANGE_PROPERTIES:
+        cap.set(prop, -1e4)
+        low = cap.get(prop)
+        cap.set(prop, 1e4)
+        high = cap.get(prop)
+        if low < high:
+            info["min"], info["max"] = low, high
+        cap.set(prop, default)
+
+    return info
+
+
+def probe_camera(camera_index=0):
+    """
+    打开摄像头并探测完整的能力档案
+
+    Returns:
+        dict: 能力档案，无法打开摄像头时返回None
+    """
+    start = cv2.getTickCount()
+    cap = cv2.VideoCapture(camera_index)
+    if not cap.isOpened():
+        return None
+    open_latency_ms = (cv2.getTickCount() - start) / cv2.getTickFrequency() * 1000
+
+    try:
+        # 探测支持的分辨率
+        supported = []
+        for width, height in CANDIDATE_RESOLUTIONS:
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+            if (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)) == width and
+                    int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) == height):
+                supported.append([width, height])
+
+        # 探测参数
+        names = list(dict.fromkeys(list(DESIRED_SETTINGS) + RANGE_PROPERTIES))
+        properties = {name: _probe_property(cap, name) for name in names}
+
+        # 只保留可设置的期望值，并截断到探测到的范围内
+        best_settings = {}
+        for name, value in DESIRED_SETTINGS.items():
+            info = properties[name]
+            if not info["settable"]:
+                continue
+            if "min" in info:
+                value = min(max(value, info["min"]), info["max"])
+            best_settings[name] = value
+
+        return {
+            "device": device_key(camera_index),
+            "backend": cap.getBackendName(),
+            "created": datetime.now().isoformat(timespec='seconds'),
+            "open_latency_ms": round(open_latency_ms, 1),
+            "supported_resolutions": supported,
+            "best_resolution": supported[0] if supported else None,
+            "properties": properties,
+            "best_settings": best_settings,
+        }
+    finally:
+        cap.release()
+
+
+def apply_camera_profile(cap, profile, max_resolution=(1920, 1080)):
+    """
+    按能力档案设置摄像头，只设置支持的参数
+
+    Args:
+        cap: 已打开的摄像头
+        profile: 能力档案
+        max_resolution: 不超过此分辨率的最高支持分辨率会被使用；
+                        档案中没有合适的分辨率时直接请求该分辨率（由摄像头选择最接近的）
+
+    Returns:
+        int: 成功应用的设置数量
+    """
+    applied = 0
+
+    resolutions = [r for r in profile.get("supported_resolutions", [])
+                   if r[0] <= max_resolution[0] and r[1] <= max_resolution[1]]
+    # 没有探测到合适的分辨率时仍请求最大分辨率，避免停留在默认的640x480
+    width, height = resolutions[0] if resolutions else max_resolution
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    if resolutions:
+        applied += 1
+
+    for name, value in profile.get("best_settings", {}).items():
+        if cap.set(prop_id(name), value):
+            applied += 1
+
+    return applied
@@ -5,102 +5,110 @@
 用于测试和优化摄像头设置，确保获得最佳图像质量
 """
 
+import argparse
 import cv2
 import numpy as np
 import os
 from datetime import datetime
 
+from camera_profile import (CANDIDATE_RESOLUTIONS, DEFAULT_PROFILE_PATH,
+                            load_camera_profile, probe_camera, prop_id,
+                            save_camera_profile)
+
+# 摄像头属性的中文名称
+PROPERTY_LABELS = {
+    "FPS": "帧率",
+    "BRIGHTNESS": "亮度",
+    "CONTRAST": "对比度",
+    "SATURATION": "饱和度",
+    "GAIN": "增益",
+    "EXPOSURE": "曝光",
+    "SHARPNESS": "锐度",
+    "AUTOFOCUS": "自动对焦",
+    "AUTO_WB": "自动白平衡",
+    "BUFFERSIZE": "缓冲区大小",
+}
+
 class CameraOptimizer:
-    def __init__(self):
+    def __init__(self, profile_path=DEFAULT_PROFILE_PATH):
         self.camera_index = 0
+        self.profile_path = profile_path
+        # 最近一次获取的档案是否来自缓存（来自缓存时摄像头没有被打开）
+        self.profile_from_cache = False
     
-    def test_camera_capabilities(self, camera_index=0):
+    def get_capability_profile(self, camera_index=0, refresh=False):
+        """
+        获取摄像头能力档案（优先使用缓存，refresh=True时重新探测并保存）
+        """
+        profile = None if refresh else load_camera_profile(camera_index, self.profile_path)
+        self.profile_from_cache = profile is not None
+        if profile is not None:
+            print(f"📄 使用缓存的摄像头档案: {self.profile_path} ({profile['created']})")
+            return profile
+        
+        print("正在探测摄像头能力（仅首次或刷新时需要）...")
+        profile = probe_camera(camera_index)
+        if profile is None:
+            return None
+        save_camera_profile(camera_index, profile, self.profile_path)
+        print(f"💾 摄像头档案已保存: {self.profile_path}")
+        return profile
+    
+    def test_camera_capabilities(self, camera_index=0, refresh=False):
         """
         测试摄像头支持的最大能力
         """
         print("=== 摄像头能力测试 ===")
         
-        cap = cv2.VideoCapture(camera_index)
-        if not cap.isOpened():
+        profile = self.get_capability_profile(camera_index, refresh)
+        if profile is None:
             print("❌ 无法打开摄像头")
             return False
         
-        print("✅ 摄像头打开成功")
+        if self.profile_from_cache:
+            print("✅ 已读取摄像头档案（未重新打开摄像头，使用 --refresh 重新探测）")
+        else:
+            print("✅ 摄像头打开成功")
+        print(f"  后端: {profile['backend']}")
+        print(f"  打开耗时: {profile['open_latency_ms']:.1f} ms")
         
-        # 测试支持的分辨率
+        # 支持的分辨率
         print("\n📹 测试支持的分辨率:")
-        resolutions = [
-            (3840, 2160),  # 4K
-            (2560, 1440),  # 2K
-            (1920, 1080),  # 1080p
-            (1280, 720),   # 720p
-            (640, 480),    # VGA
-        ]
-        
-        supported_resolutions = []
-        for width, height in resolutions:
-            cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
-            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
-            
-            actual_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-            actual_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-            
-            if actual_width == width and actual_height == height:
+        supported = [tuple(r) for r in profile['supported_resolutions']]
+        for width, height in CANDIDATE_RESOLUTIONS:
+            if (width, height) in supported:
                 print(f"  ✅ {width}x{height}")
-                supported_resolutions.append((width, height))
             else:
-                print(f"  ❌ {width}x{height} (实际: {actual_width}x{actual_height})")
+                print(f"  ❌ {width}x{height}")
         
         # 使用最高支持的分辨率
-        if supported_resolutions:
-            best_res = supported_resolutions[0]
-            cap.set(cv2.CAP_PROP_FRAME_WIDTH, best_res[0])
-            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, best_res[1])
+        if profile['best_resolution']:
+            best_res = profile['best_resolution']
             print(f"\n🎯 推荐使用分辨率: {best_res[0]}x{best_res[1]}")
         
-        # 测试帧率
-        print(f"\n⚡ 当前帧率: {cap.get(cv2.CAP_PROP_FPS):.1f} FPS")
-        
         # 显示当前所有参数
-        self._display_all_camera_properties(cap)
+        self._display_profile_properties(profile)
         
-        cap.release()
         return True
     
-    def _display_all_camera_properties(self, cap):
+    def _display_profile_properties(self, profile):
         """
-        显示摄像头所有可用属性
+        显示档案中记录的摄像头属性
         """
         print("\n📊 摄像头详细参数:")
         
-        properties = [
-            (cv2.CAP_PROP_FRAME_WIDTH, "宽度"),
-            (cv2.CAP_PROP_FRAME_HEIGHT, "高度"),
-            (cv2.CAP_PROP_FPS, "帧率"),
-            (cv2.CAP_PROP_BRIGHTNESS, "亮度"),
-            (cv2.CAP_PROP_CONTRAST, "对比度"),
-            (cv2.CAP_PROP_SATURATION, "饱和度"),
-            (cv2.CAP_PROP_HUE, "色调"),
-            (cv2.CAP_PROP_GAIN, "增益"),
-            (cv2.CAP_PROP_EXPOSURE, "曝光"),
-            (cv2.CAP_PROP_SHARPNESS, "锐度"),
-            (cv2.CAP_PROP_AUTOFOCUS, "自动对焦"),
-            (cv2.CAP_PROP_AUTO_WB, "自动白平衡"),
-            (cv2.CAP_PROP_AUTO_EXPOSURE, "自动曝光"),
-            (cv2.CAP_PROP_BUFFERSIZE, "缓冲区大小"),
-        ]
+        for name, info in profile['properties'].items():
+            label = PROPERTY_LABELS.get(name, name)
+            if not info['settable']:
+                print(f"  {label}: {info['default']:.2f} (不支持设置)")
+            elif 'min' in info:
+                print(f"  {label}: {info['default']:.2f} (范围 {info['min']:.2f} ~ {info['max']:.2f})")
+            else:
+                print(f"  {label}: {info['default']:.2f}")
         
-        for prop, name in properties:
-            try:
-                value = cap.get(prop)
-                if prop in [cv2.CAP_PROP_FRAME_WIDTH, cv2.CAP_PROP_FRAME_HEIGHT, cv2.CAP_PROP_BUFFERSIZE]:
-                    print(f"  {name}: {int(value)}")
-                elif prop in [cv2.CAP_PROP_AUTOFOCUS, cv2.CAP_PROP_AUTO_WB]:
-                    print(f"  {name}: {'开启' if value > 0 else '关闭'}")
-                else:
-                    print(f"  {name}: {value:.2f}")
-            except:
-                print(f"  {name}: 不支持")
+        print("\n🎯 最佳设置:")
+        for name, value in profile['best_settings'].items():
+            print(f"  {PROPERTY_LABELS.get(name, name)}: {value}")
     
     def optimize_camera_settings(self, camera_index=0):
         """
@@ -116,9 +124,12 @@ class CameraOptimizer:
         # 设置最佳参数
         print("正在应用最佳设置...")
         
-        # 分辨率设置（尝试最高分辨率）
-        resolutions_to_try = [(1920, 1080), (1280, 720), (640, 480)]
-        for width, height in resolutions_to_try:
+        # 分辨率设置（直接使用档案中不超过1080p的最高分辨率，不再逐个尝试）
+        profile = load_camera_profile(camera_index, self.profile_path)
+        supported = profile['supported_resolutions'] if profile else []
+        for width, height in [(1920, 1080), (1280, 720), (640, 480)]:
+            if profile is not None and [width, height] not in supported:
+                continue
             cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
             cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
             actual_w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
@@ -129,20 +140,30 @@ class CameraOptimizer:
         
         # 图像质量优化
         optimizations = [
-            (cv2.CAP_PROP_BUFFERSIZE, 1, "缓冲区大小"),
-            (cv2.CAP_PROP_FPS, 30, "帧率"),
-            (cv2.CAP_PROP_AUTO_EXPOSURE, 0.25, "自动曝光"),
-            (cv2.CAP_PROP_EXPOSURE, -6, "曝光值"),
-            (cv2.CAP_PROP_BRIGHTNESS, 0.5, "亮度"),
-            (cv2.CAP_PROP_CONTRAST, 0.6, "对比度"),
-            (cv2.CAP_PROP_SATURATION, 0.6, "饱和度"),
-            (cv2.CAP_PROP_SHARPNESS, 0.7, "锐度"),
-            (cv2.CAP_PROP_GAIN, 0, "增益"),
-            (cv2.CAP_PROP_AUTO_WB, 1, "自动白平衡"),
-            (cv2.CAP_PROP_AUTOFOCUS, 1, "自动对焦"),
+            ("BUFFERSIZE", 1, "缓冲区大小"),
+            ("FPS", 30, "帧率"),
+            ("AUTO_EXPOSURE", 0.25, "自动曝光"),
+            ("EXPOSURE", -6, "曝光值"),
+            ("BRIGHTNESS", 0.5, "亮度"),
+            ("CONTRAST", 0.6, "对比度"),
+            ("SATURATION", 0.6, "饱和度"),
+            ("SHARPNESS", 0.7, "锐度"),
+            ("GAIN", 0, "增益"),
+            ("AUTO_WB", 1, "自动白平衡"),
+            ("AUTOFOCUS", 1, "自动对焦"),
         ]
         
-        for prop, value, name in optimizations:
+        # 档案中记录为不可设置的参数直接跳过
+        unsupported = set()
+        if profile is not None:
+            unsupported = {prop_name for prop_name, info in profile['properties'].items()
+                           if not info['settable']}
+        
+        for prop_name, value, name in optimizations:
+            if prop_name in unsupported:
+                print(f"  {name}: 不支持设置（已跳过）")
+                continue
+            prop = prop_id(prop_name)
             try:
                 cap.set(prop, value)
                 actual = cap.get(prop)
@@ -221,20 +242,26 @@ class CameraOptimizer:
 
 def main():
     """主函数"""
-    optimizer = CameraOptimizer()
+    parser = argparse.ArgumentParser(description='摄像头优化工具')
+    parser.add_argument('--camera', type=int, default=0, help='摄像头索引 (默认: 0)')
+    parser.add_argument('--profile', type=str, default=DEFAULT_PROFILE_PATH, help='摄像头档案缓存文件')
+    parser.add_argument('--refresh', action='store_true', help='忽略缓存，重新探测摄像头能力')
+    args = parser.parse_args()
+    
+    optimizer = CameraOptimizer(args.profile)
     
     print("摄像头优化工具")
     print("="*50)
     
     # 测试摄像头能力
-    if not optimizer.test_camera_capabilities():
+    if not optimizer.test_camera_capabilities(args.camera, refresh=args.refresh):
         print("摄像头测试失败")
         return
     
     print("\n" + "="*50)
     
     # 拍摄优化测试照片
-    optimizer.capture_test_photo()
+    optimizer.capture_test_photo(args.camera)
     
     print("\n" + "="*50)
     print("🎉 测试完成！")
@@ -5,16 +5,38 @@ FFmpeg视频制作工具 - 兼容版本
 解决glob模式不支持的问题
 """
 
+import argparse
 import os
-import subprocess
 import sys
 from pathlib import Path
 import tempfile
 
-def create_file_list():
-    """创建文件列表（解决glob不支持问题）"""
-    aligned_dir = Path("aligned_photos").resolve()  # 使用绝对路径
-    jpg_files = sorted(aligned_dir.glob("*.jpg"))
+import cv2
+
+from deflicker import DEFAULT_SIGMA, deflicker_frames, prepare_deflicker
+from ffmpeg_runner import FFmpegJob, print_progress, report_job
+from frame_blend import BLEND_MODES, interpolate_frames
+from frame_validation import validate_directory
+from output_profiles import OUTPUT_PROFILES, encode_profiles, parse_profiles
+from sinks import VideoSink, encode_to_sinks
+from timelapse_core import setup_logging
+
+# concat方式读取图片序列时每张图片的默认帧率（ffmpeg image2默认25）
+CONCAT_IMAGE_FPS = 25
+
+# 输出的视频版本：(文件名, 帧率, 质量, 说明)
+VIDEO_VERSIONS = [
+    ("timelapse_preview.mp4", 30, 23, "快速预览版"),   # 30fps, 中等质量
+    ("timelapse_standard.mp4", 15, 20, "标准版"),      # 15fps, 高质量
+    ("timelapse_hq.mp4", 10, 18, "高质量版"),          # 10fps, 最高质量
+]
+
+def create_file_list(source_dir="aligned_photos", jpg_files=None):
+    """创建文件列表（解决glob不支持问题），jpg_files为None时使用目录中的全部jpg"""
+    if jpg_files is None:
+        aligned_dir = Path(source_dir).resolve()  # 使用绝对路径
+        jpg_files = sorted(aligned_dir.glob("*.jpg"))
+    jpg_files = [Path(f) for f in jpg_files]
     
     if not jpg_files:
         print("❌ 没有找到jpg文件")
@@ -39,8 +61,13 @@ def create_file_list():
         os.unlink(temp_file.name)
         return None
 
-def create_timelapse_video(file_list_path, output_name, framerate=15, quality=18):
-    """使用文件列表方式创建延时视频"""
+def create_timelapse_video(file_list_path, output_name, framerate=15, quality=18, timeout=None):
+    """
+    使用文件列表方式创建延时视频（实时显示进度，Ctrl+C取消）
+    
+    Args:
+        timeout: 最长编码时间（秒），超时后取消；None为不限
+    """
     
     cmd = [
         'ffmpeg', '-y',  # 覆盖输出文件
@@ -58,40 +85,130 @@ def create_timelapse_video(file_list_path, output_name, framerate=15, quality=18
     print(f"🎬 创建视频: {output_name}")
     print("命令:", " ".join(cmd))
     
+    # concat读取图片时每张图占 1/CONCAT_IMAGE_FPS 秒，据此估算视频时长用于计算剩余时间
+    frame_count = _count_list_entries(file_list_path)
+    job = FFmpegJob(cmd, total_duration=frame_count / CONCAT_IMAGE_FPS if frame_count else None)
+    
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
-        
-        if result.returncode == 0:
-            print(f"✅ 视频创建成功: {output_name}")
-            
-            # 显示文件信息
-            if os.path.exists(output_name):
-                file_size = os.path.getsize(output_name) / (1024 * 1024)
-                print(f"📁 文件大小: {file_size:.1f} MB")
-            
-            return True
-        else:
-            print("❌ 视频创建失败")
-            print("错误信息:")
-            print(result.stderr[-800:])  # 显示最后800字符
-            return False
-            
-    except subprocess.TimeoutExpired:
-        print("❌ 视频创建超时（超过5分钟）")
+        job.start()
+        returncode = job.wait(timeout=timeout)
+    except KeyboardInterrupt:
+        print("\n⏹️ 已取消编码")
+        job.record_metrics(output_name, input_frames=frame_count, framerate=framerate)
+        raise
+    except Exception as e:
+        print(f"❌ 执行命令时出错: {e}")
         return False
+    
+    return report_job(job, output_name, input_frames=frame_count, framerate=framerate)
+
+def _count_list_entries(file_list_path):
+    """统计ffmpeg文件列表中的文件数"""
+    with open(file_list_path, 'r', encoding='utf-8') as f:
+        return sum(1 for line in f if line.startswith("file "))
+
+def iter_frames(paths):
+    """逐张读取图像的生成器（读取失败的文件跳过）"""
+    for path in paths:
+        frame = cv2.imread(str(path))
+        if frame is None:
+            print(f"⚠️ 无法读取，已跳过: {path}")
+            continue
+        yield frame
+
+def create_timelapse_video_from_frames(frames, output_name, framerate=15, quality=18, total_frames=None,
+                                      scale="1920:1080"):
+    """
+    将内存中的帧序列通过管道直接送入ffmpeg编码（不生成中间文件）
+    
+    Args:
+        frames: BGR帧的可迭代对象（尺寸需一致），可以是生成器
+        output_name: 输出视频文件名
+        framerate: 视频帧率
+        quality: CRF质量参数
+        total_frames: 预计总帧数（用于显示剩余时间）
+        scale: 输出分辨率（ffmpeg scale滤镜参数），None则保持帧的尺寸
+    """
+    print(f"🎬 创建视频: {output_name}")
+    
+    sink = VideoSink(output_name, framerate=framerate, quality=quality, scale=scale,
+                     total_frames=total_frames, on_progress=print_progress)
+    try:
+        for frame in frames:
+            if sink.write(None, frame) is None:
+                break  # ffmpeg已退出
+    except KeyboardInterrupt:
+        print("\n⏹️ 已取消编码")
+        sink.cancel()
+        raise
     except Exception as e:
         print(f"❌ 执行命令时出错: {e}")
+        sink.cancel()
         return False
+    
+    if sink.job is None:
+        print("❌ 没有可编码的帧")
+        return False
+    
+    sink.close()  # 失败时由sink输出错误信息
+    return report_job(sink.job, output_name, show_stderr=False,
+                      input_frames=sink.frame_count, framerate=framerate)
+
+def create_timelapse_videos_from_frames(frames, versions=VIDEO_VERSIONS, total_frames=None):
+    """
+    一次遍历帧序列，同时编码多个版本（每帧只读取和插值一次，写入每个版本的编码器）
+    
+    帧按 CONCAT_IMAGE_FPS 输入、按各版本帧率输出，与文件列表方式的时长和取帧一致
+    
+    Args:
+        frames: BGR帧的可迭代对象（尺寸需一致），可以是生成器
+        versions: [(文件名, 帧率, 质量, 说明), ...]
+        total_frames: 预计总帧数（用于显示进度）
+        
+    Returns:
+        int: 成功创建的视频数
+    """
+    for video_file, framerate, quality, label in versions:
+        print(f"🎬 创建{label}: {video_file} ({framerate} fps, CRF {quality})")
+    
+    sinks = {video_file: VideoSink(video_file, framerate=framerate, quality=quality, total_frames=total_frames,
+                                   on_progress=None, input_framerate=CONCAT_IMAGE_FPS)
+             for video_file, framerate, quality, _ in versions}
+    results = encode_to_sinks(frames, sinks, total_frames=total_frames)
+    return sum(results.values())
 
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description='FFmpeg视频制作工具')
+    parser.add_argument('--input', type=str, default='aligned_photos', help='对齐照片目录 (默认: aligned_photos)')
+    parser.add_argument('--deflicker', action='store_true', help='编码前对序列去闪烁（亮度归一化）')
+    parser.add_argument('--sigma', type=float, default=DEFAULT_SIGMA, help='去闪烁亮度曲线平滑程度，单位为帧 (默认: 5)')
+    parser.add_argument('--blend', type=int, default=0, help='每两张照片之间插入的过渡帧数 (默认: 0，不插帧)')
+    parser.add_argument('--blend-mode', type=str, default='crossfade', choices=BLEND_MODES,
+                        help='过渡帧合成方式: crossfade=交叉淡化, flow=光流插值')
+    parser.add_argument('--full-check', action='store_true', help='编码前完整解码每一帧（默认只检查文件头）')
+    parser.add_argument('--quarantine', action='store_true', help='把损坏的帧移动到 quarantine/ 子目录')
+    parser.add_argument('--profiles', type=str, default=None,
+                        help=f'一次遍历同时输出多种规格，逗号分隔（可选: {", ".join(OUTPUT_PROFILES)}）')
+    parser.add_argument('--fps', type=int, default=15, help='多规格输出的帧率 (默认: 15)')
+    parser.add_argument('--quality', type=int, default=20, help='多规格输出的CRF质量 (默认: 20)')
+    args = parser.parse_args()
+    setup_logging()
+    
+    profiles = None
+    if args.profiles:
+        try:
+            profiles = parse_profiles(args.profiles)
+        except ValueError as e:
+            parser.error(str(e))
+    
     print("🎬 FFmpeg视频制作工具（兼容版）")
     print("=" * 50)
     
     # 检查输入文件
-    aligned_dir = Path("aligned_photos")
+    aligned_dir = Path(args.input)
     if not aligned_dir.exists():
-        print("❌ aligned_photos目录不存在")
+        print(f"❌ {aligned_dir}目录不存在")
         print("💡 请先运行: python timelapse_demo.py")
         return
     
@@ -103,42 +220,83 @@ def main():
     
     print(f"📷 找到 {len(jpg_files)} 张照片")
     
-    # 创建文件列表
-    file_list_path = create_file_list()
-    if not file_list_path:
+    # 编码前检查帧完整性，损坏的帧不会进入文件列表
+    valid_files = validate_directory(aligned_dir, full_decode=args.full_check, quarantine=args.quarantine)
+    if len(valid_files) < 2:
+        print(f"❌ 有效照片数量不足: {len(valid_files)}张，至少需要2张")
+        return
+    
+    paths = [str(f) for f in valid_files]
+    
+    luts = None
+    if args.deflicker:
+        # 去闪烁：统一整个序列的亮度变化（只统计亮度，校正在读取帧时用查找表完成，不写中间文件）
+        print("\n🌗 去闪烁处理...")
+        luts = prepare_deflicker(paths, args.sigma)
+    
+    def source_frames():
+        """读取帧（去闪烁时读取后直接应用查找表）"""
+        if luts is None:
+            return iter_frames(paths)
+        return (image for _, image in deflicker_frames(paths, luts))
+    
+    if profiles:
+        # 多规格输出：每帧只读取一次，切片后同时送入各规格的编码器
+        frames = source_frames()
+        total_frames = len(paths)
+        if args.blend > 0:
+            frames = interpolate_frames(frames, args.blend, args.blend_mode)
+            total_frames += (len(paths) - 1) * args.blend
+        print(f"\n🎬 多规格输出: {', '.join(profiles)}")
+        try:
+            results = encode_profiles(frames, profiles, framerate=args.fps,
+                                      quality=args.quality, total_frames=total_frames)
+        except KeyboardInterrupt:
+            print("\n⏹️ 已取消编码")
+            return
+        print(f"\n🎉 完成！成功创建 {sum(results.values())}/{len(results)} 个文件")
         return
     
+    file_list_path = None
     try:
         # 创建多个版本的视频
         videos_created = 0
         
-        # 1. 快速预览版 (30fps, 中等质量)
-        print("\n🎬 创建快速预览版...")
-        if create_timelapse_video(file_list_path, "timelapse_preview.mp4", framerate=30, quality=23):
-            videos_created += 1
-        
-        # 2. 标准版 (15fps, 高质量)
-        print("\n🎬 创建标准版...")
-        if create_timelapse_video(file_list_path, "timelapse_standard.mp4", framerate=15, quality=20):
-            videos_created += 1
-        
-        # 3. 高质量版 (10fps, 最高质量)
-        print("\n🎬 创建高质量版...")
-        if create_timelapse_video(file_list_path, "timelapse_hq.mp4", framerate=10, quality=18):
-            videos_created += 1
+        try:
+            if args.blend > 0 or luts is not None:
+                # 去闪烁/插帧模式：读取 -> 校正 -> 插值 -> 管道编码，流式处理，不生成中间文件；
+                # 每帧只处理一次，同时送入所有版本的编码器
+                frames = source_frames()
+                total_frames = len(paths)
+                if args.blend > 0:
+                    print(f"\n🎞️ 插帧: 每两张之间插入 {args.blend} 帧 ({args.blend_mode})")
+                    frames = interpolate_frames(frames, args.blend, args.blend_mode)
+                    total_frames += (len(paths) - 1) * args.blend
+                videos_created = create_timelapse_videos_from_frames(frames, VIDEO_VERSIONS, total_frames)
+            else:
+                # 创建文件列表
+                file_list_path = create_file_list(aligned_dir, paths)
+                if not file_list_path:
+                    return
+                for video_file, framerate, quality, label in VIDEO_VERSIONS:
+                    print(f"\n🎬 创建{label}...")
+                    if create_timelapse_video(file_list_path, video_file, framerate=framerate, quality=quality):
+                        videos_created += 1
+        except KeyboardInterrupt:
+            print("\n⏹️ 用户取消，后续视频不再创建")
         
         print(f"\n🎉 完成！成功创建 {videos_created} 个视频文件")
         
         if videos_created > 0:
             print("\n📁 生成的视频文件:")
-            for video_file in ["timelapse_preview.mp4", "timelapse_standard.mp4", "timelapse_hq.mp4"]:
+            for video_file, _, _, _ in VIDEO_VERSIONS:
                 if os.path.exists(video_file):
                     size = os.path.getsize(video_file) / (1024 * 1024)
                     print(f"   🎬 {video_file} ({size:.1f} MB)")
         
     finally:
         # 清理临时文件
-        if os.path.exists(file_list_path):
+        if file_list_path and os.path.exists(file_list_path):
             os.unlink(file_list_path)
             print(f"\n🧹 清理临时文件: {file_list_path}")
 
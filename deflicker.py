@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+延时序列去闪烁
+统计每帧亮度 -> 平滑得到目标亮度曲线 -> 用256项查找表(cv2.LUT)逐帧校正
+"""
+
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from file_cache import map_cached
+
+# 亮度统计缓存文件名（保存在输入目录中）
+STATS_CACHE_NAME = ".deflicker_stats.json"
+
+# 默认平滑窗口（高斯sigma，单位：帧）
+DEFAULT_SIGMA = 5.0
+
+# 单帧最大校正幅度（gamma的上下限），避免异常帧被过度拉伸
+GAMMA_RANGE = (0.5, 2.0)
+
+
+def _frame_luminance(path):
+    """
+    计算单帧的平均亮度（1/4尺寸解码，忽略对齐后的黑色填充区域）
+
+    Returns:
+        float: 平均亮度 (0-255)，读取失败返回NaN
+    """
+    gray = cv2.imread(str(path), cv2.IMREAD_REDUCED_GRAYSCALE_4)
+    if gray is None:
+        return float("nan")
+    content = gray[gray > 2]
+    return float(content.mean()) if content.size else float("nan")
+
+
+def compute_luminance_stats(paths, cache_path=None, workers=None):
+    """
+    计算每帧平均亮度，按文件名+修改时间+大小缓存，只统计新增或改动过的帧
+
+    Args:
+        paths: 帧文件路径列表
+        cache_path: 缓存文件路径（None则不缓存）
+        workers: 并行线程数
+
+    Returns:
+        numpy.ndarray: 每帧平均亮度
+    """
+    luminance, computed = map_cached(_frame_luminance, paths, cache_path, workers)
+    if computed:
+        print(f"📊 统计亮度: {computed} 帧（缓存命中 {len(paths) - computed} 帧）")
+    return np.array(luminance, dtype=np.float64)
+
+
+def smooth_curve(values, sigma=DEFAULT_SIGMA):
+    """
+    高斯平滑亮度曲线，得到目标亮度（读取失败的帧用相邻帧插值）
+
+    Returns:
+        numpy.ndarray: 平滑后的目标亮度
+    """
+    values = np.asarray(values, dtype=np.float64)
+    valid = np.isfinite(values)
+    if not valid.any():
+        return values.copy()
+    index = np.arange(len(values))
+    filled = np.interp(index, index[valid], values[valid])
+    if sigma <= 0 or len(values) < 2:
+        return filled
+
+    radius = int(3 * sigma)
+    kernel = np.exp(-0.5 * (np.arange(-radius, radius + 1) / sigma) ** 2)
+    kernel /= kernel.sum()
+    padded = np.pad(filled, radius, mode="reflect" if len(filled) > radius else "edge")
+    return np.convolve(padded, kernel, mode="valid")
+
+
+def build_luts(luminance, target):
+    """
+    为每帧生成256项gamma校正查找表，使该帧平均亮度映射到目标亮度
+    gamma校正保持0和255不变，黑色填充区域不受影响，高光也不会被截断
+
+    Returns:
+        numpy.ndarray: (N, 256) 的uint8查找表
+    """
+    mean = np.clip(np.nan_to_num(luminance, nan=128.0), 1.0, 254.0) / 255.0
+    goal = np.clip(target, 1.0, 254.0) / 255.0
+    gamma = np.clip(np.log(goal) / np.log(mean), *GAMMA_RANGE)
+    levels = np.arange(256, dtype=np.float64) / 255.0
+    luts = np.power(levels[None, :], gamma[:, None]) * 255.0
+    return np.clip(luts + 0.5, 0, 255).astype(np.uint8)
+
+
+def deflicker_frames(paths, luts):
+    """
+    逐帧读取并应用查找表的生成器（供视频编码直接使用，不落盘）
+    查找表原地应用到解码出的图像上，不再分配新的缓冲区
+
+    Yields:
+        tuple: (路径, 校正后的图像)
+    """
+    for path, lut in zip(paths, luts):
+        image = cv2.imread(str(path))
+        if image is None:
+            continue
+        yield path, cv2.LUT(image, lut, dst=image)
+
+
+def prepare_deflicker(paths, sigma=DEFAULT_SIGMA, workers=None):
+    """
+    统计亮度并生成每帧查找表
+
+    Returns:
+        numpy.ndarray: (N, 256) 的uint8查找表
+    """
+    if not paths:
+        return np.zeros((0, 256), dtype=np.uint8)
+    cache_path = os.path.join(os.path.dirname(str(paths[0])), STATS_CACHE_NAME)
+    luminance = compute_luminance_stats(paths, cache_path, workers)
+    target = smooth_curve(luminance, sigma)
+    return build_luts(luminance, target)
+
+
+def deflicker_directory(input_dir="aligned_photos", output_dir="deflickered_photos",
+                        sigma=DEFAULT_SIGMA, workers=None, paths=None):
+    """
+    对目录中的整个序列去闪烁，结果以相同文件名保存到输出目录
+
+    Args:
+        paths: 只处理这些帧（None则处理目录中的全部jpg）
+
+    Returns:
+        int: 成功处理的帧数
+    """
+    if paths is None:
+        paths = Path(input_dir).glob("*.jpg")
+    paths = sorted(str(p) for p in paths)
+    if not paths:
+        print(f"❌ 没有找到jpg文件: {input_dir}")
+        return 0
+
+    os.makedirs(output_dir, exist_ok=True)
+    luts = prepare_deflicker(paths, sigma, workers)
+
+    def _process(item):
+        path, lut = item
+        image = cv2.imread(path)
+        if image is None:
+            return False
+        output_path = os.path.join(output_dir, os.path.basename(path))
+        return cv2.imwrite(output_path, cv2.LUT(image, lut))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        done = sum(executor.map(_process, zip(paths, luts)))
+
+    print(f"✅ 去闪烁完成: {done}/{len(paths)} 帧 -> {output_dir}")
+    return done
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='延时序列去闪烁')
+    parser.add_argument('--input', type=str, default='aligned_photos', help='输入目录 (默认: aligned_photos)')
+    parser.add_argument('--output', type=str, default='deflickered_photos', help='输出目录 (默认: deflickered_photos)')
+    parser.add_argument('--sigma', type=float, default=DEFAULT_SIGMA, help='亮度曲线平滑程度，单位为帧 (默认: 5)')
+    parser.add_argument('--workers', type=int, default=None, help='并行线程数')
+    args = parser.parse_args()
+
+    deflicker_directory(args.input, args.output, args.sigma, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ffmpeg进程管理
+通过 -progress pipe:1 实时解析编码进度（帧数、fps、速度、剩余时间），支持取消，
+stderr只保留最后若干行，编码结束后把吞吐量记录到渲染指标文件
+"""
+
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+# 渲染指标文件（每次编码追加一行JSON）
+DEFAULT_METRICS_PATH = "render_metrics.jsonl"
+
+# 保留的stderr行数（失败时输出）
+STDERR_TAIL_LINES = 40
+
+# 取消时等待ffmpeg自行退出的秒数，超时后强制结束
+CANCEL_GRACE_SECONDS = 5
+
+
+def _format_seconds(seconds):
+    """秒数格式化为 mm:ss 或 h:mm:ss"""
+    if seconds is None:
+        return "--:--"
+    seconds = int(max(0, seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes:02d}:{secs:02d}"
+
+
+def print_progress(stats, final=False):
+    """默认的进度输出：在同一行刷新"""
+    eta = "完成" if final else f"剩余 {_format_seconds(stats.get('eta'))}"
+    percent = f"{stats['percent']:5.1f}% | " if stats.get('percent') is not None else ""
+    line = (f"\r   ⏳ {percent}{stats.get('frame', 0)} 帧 | {stats.get('fps', 0):.1f} fps | "
+            f"{stats.get('speed', 0):.2f}x | {eta}   ")
+    sys.stdout.write(line + ("\n" if final else ""))
+    sys.stdout.flush()
+
+
+class FFmpegJob:
+    """
+    运行一个ffmpeg命令并实时跟踪进度
+
+    用法：
+        job = FFmpegJob(cmd, total_duration=12.0)
+        job.start()
+        returncode = job.wait()      # Ctrl+C 时自动取消
+        job.record_metrics("preview.mp4")
+    """
+
+    def __init__(self, cmd, total_duration=None, feed_stdin=False, on_progress=print_progress,
+                 report_interval=0.5):
+        """
+        Args:
+            cmd: ffmpeg命令（不含进度参数，会自动加入 -progress pipe:1 -nostats）
+            total_duration: 输出视频的预计时长（秒），用于计算百分比和剩余时间
+            feed_stdin: 是否通过 write() 向ffmpeg的stdin写入数据
+            on_progress: 进度回调 on_progress(stats, final=False)，None则不输出
+            report_interval: 进度回调的最小间隔（秒）
+        """
+        self.cmd = [cmd[0], '-progress', 'pipe:1', '-nostats'] + list(cmd[1:])
+        self.total_duration = total_duration
+        self.feed_stdin = feed_stdin
+        self.on_progress = on_progress
+        self.report_interval = report_interval
+
+        self.process = None
+        self.stats = {}
+        self.cancelled = False
+        self.start_time = None
+        self.end_time = None
+        self._stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+        self._threads = []
+        self._last_report = 0.0
+
+    def start(self):
+        self.start_time = time.monotonic()
+        # stdin始终使用管道：送帧模式下写入数据，否则用于取消时发送 q 命令
+        self.process = subprocess.Popen(
+            self.cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        for target in (self._read_progress, self._read_stderr):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def _read_stderr(self):
+        # 持续读取stderr，避免管道写满阻塞ffmpeg；只保留最后若干行
+        for line in iter(self.process.stderr.readline, b''):
+            self._stderr_tail.append(line.decode('utf-8', errors='replace').rstrip())
+
+    def _read_progress(self):
+        block = {}
+        for raw in iter(self.process.stdout.readline, b''):
+            key, _, value = raw.decode('utf-8', errors='replace').strip().partition('=')
+            if key != 'progress':
+                block[key] = value
+                continue
+            self._update(block, final=(value == 'end'))
+            block = {}
+
+    def _update(self, block, final=False):
+        """把一个进度块转换为统计数据并回调"""
+        stats = dict(self.stats)
+        try:
+            stats['frame'] = int(block.get('frame', stats.get('frame', 0)))
+            stats['fps'] = float(block.get('fps', stats.get('fps', 0)) or 0)
+            stats['speed'] = float(block.get('speed', '0x').rstrip('x') or 0)
+        except ValueError:
+            pass
+        out_time_us = block.get('out_time_us') or block.get('out_time_ms')
+        if out_time_us and out_time_us.lstrip('-').isdigit():
+            stats['out_time'] = max(0, int(out_time_us)) / 1e6
+
+        # 剩余时间 = 剩余的视频时长 / 编码速度
+        if self.total_duration and 'out_time' in stats:
+            stats['percent'] = min(100.0, stats['out_time'] / self.total_duration * 100)
+            if stats.get('speed'):
+                stats['eta'] = max(0.0, self.total_duration - stats['out_time']) / stats['speed']
+        self.stats = stats
+
+        now = time.monotonic()
+        if self.on_progress and (final or now - self._last_report >= self.report_interval):
+            self._last_report = now
+            self.on_progress(stats, final=final)
+
+    def write(self, data):
+        """向ffmpeg的stdin写入数据，ffmpeg已退出时返回False"""
+        if self.cancelled:
+            return False
+        try:
+            self.process.stdin.write(data)
+            return True
+        except (BrokenPipeError, OSError):
+            return False
+
+    def cancel(self):
+        """
+        取消编码：先请求ffmpeg正常退出（送帧模式下关闭stdin，否则发送 q 命令），
+        超时后强制结束（Windows上 terminate() 等同于强制结束，所以不依赖它做正常退出）
+        """
+        if self.process is None or self.process.poll() is not None:
+            return
+        self.cancelled = True
+        try:
+            if not self.feed_stdin:
+                self.process.stdin.write(b'q')
+                self.process.stdin.flush()
+            self.process.stdin.close()
+        except OSError:
+            pass
+        try:
+            self.process.wait(timeout=CANCEL_GRACE_SECONDS)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+    def wait(self, timeout=None):
+        """
+        等待编码结束（Ctrl+C 会取消编码）
+
+        Args:
+            timeout: 最长等待秒数，超时后取消（None为不限）
+
+        Returns:
+            int: ffmpeg返回码
+        """
+        if self.feed_stdin and not self.cancelled:
+            try:
+                self.process.stdin.close()
+            except OSError:
+                pass
+        try:
+            self.process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            self.cancel()
+        except KeyboardInterrupt:
+            self.cancel()
+            raise
+        finally:
+            for thread in self._threads:
+                thread.join(timeout=5)
+            try:
+                self.process.stdin.close()
+            except OSError:
+                pass
+            self.end_time = time.monotonic()
+        return self.process.returncode
+
+    @property
+    def elapsed(self):
+        if self.start_time is None:
+            return 0.0
+        return (self.end_time or time.monotonic()) - self.start_time
+
+    def stderr_tail(self):
+        return "\n".join(self._stderr_tail)
+
+    def record_metrics(self, output_name, path=DEFAULT_METRICS_PATH, **extra):
+        """
+        把本次编码的吞吐量追加到渲染指标文件
+
+        Returns:
+            dict: 写入的记录
+        """
+        frames = self.stats.get('frame', 0)
+        record = {
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'output': output_name,
+            'frames': frames,
+            'seconds': round(self.elapsed, 3),
+            'encode_fps': round(frames / self.elapsed, 2) if self.elapsed > 0 else 0.0,
+            'speed': self.stats.get('speed', 0.0),
+            'returncode': self.process.returncode if self.process else None,
+            'cancelled': self.cancelled,
+        }
+        record.update(extra)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return record
+
+
+def report_job(job, output_name, show_stderr=True, **metrics):
+    """
+    输出编码结果并把吞吐量记录到渲染指标文件
+
+    Returns:
+        bool: 编码是否成功
+    """
+    record = job.record_metrics(output_name, **metrics)
+
+    if job.cancelled:
+        print("\n❌ 视频创建已取消（超时）")
+        return False
+
+    if job.process.returncode != 0:
+        print("❌ 视频创建失败")
+        if show_stderr:
+            print("错误信息:")
+            print(job.stderr_tail()[-800:])  # 显示最后800字符
+        return False
+
+    print(f"✅ 视频创建成功: {output_name}")
+    print(f"⚡ 编码 {record['frames']} 帧，用时 {record['seconds']:.1f} 秒 "
+          f"({record['encode_fps']:.1f} fps, {record['speed']:.2f}x)")
+
+    # 显示文件信息
+    if os.path.exists(output_name):
+        file_size = os.path.getsize(output_name) / (1024 * 1024)
+        print(f"📁 文件大小: {file_size:.1f} MB")
+
+    return True
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按文件缓存计算结果
+以文件名+修改时间+大小判断文件是否改动，只为新增或改动过的文件重新计算，
+保存时删除已不在输入中的文件（已删除或已隔离）的条目，缓存不会无限增长
+"""
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+
+def file_key(path, stat=None):
+    """文件的缓存键：(文件名, 修改时间ns, 大小)"""
+    stat = stat or os.stat(path)
+    return Path(path).name, stat.st_mtime_ns, stat.st_size
+
+
+class FileCache:
+    """
+    JSON格式的文件结果缓存：文件名 -> {"mtime_ns", "size", "value"}
+
+    用法：
+        cache = FileCache(".stats.json")
+        value = cache.get(path)          # 文件改动过或没有缓存时返回None
+        cache.put(path, value)
+        cache.save(paths)                # 只保留paths中的文件
+    """
+
+    def __init__(self, cache_path=None):
+        """
+        Args:
+            cache_path: 缓存文件路径（None则只在内存中缓存）
+        """
+        self.cache_path = cache_path
+        self.entries = {}
+        self._dirty = False
+        if cache_path and os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError):
+                self.entries = {}
+
+    def get(self, path, stat=None):
+        """返回文件的缓存结果，文件改动过或没有缓存时返回None"""
+        name, mtime_ns, size = file_key(path, stat)
+        entry = self.entries.get(name)
+        if isinstance(entry, dict) and entry.get("mtime_ns") == mtime_ns and entry.get("size") == size:
+            return entry.get("value")
+        return None
+
+    def put(self, path, value, stat=None):
+        name, mtime_ns, size = file_key(path, stat)
+        self.entries[name] = {"mtime_ns": mtime_ns, "size": size, "value": value}
+        self._dirty = True
+
+    def save(self, paths):
+        """删除不在paths中的条目后写入缓存文件（没有变化时不写）"""
+        names = {Path(p).name for p in paths}
+        stale = [name for name in self.entries if name not in names]
+        for name in stale:
+            del self.entries[name]
+        if not self.cache_path or not (self._dirty or stale):
+            return
+        with open(self.cache_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, ensure_ascii=False)
+        self._dirty = False
+
+
+def map_cached(func, paths, cache_path=None, workers=None, reuse=None):
+    """
+    对每个文件计算 func(path)，结果按文件缓存，只计算新增或改动过的文件
+
+    Args:
+        func: 计算函数，返回值需能保存为JSON
+        paths: 文件路径列表（缓存只保留这些文件）
+        cache_path: 缓存文件路径（None则不缓存）
+        workers: 并行线程数
+        reuse: 判断缓存结果能否复用的函数（None则都复用）
+
+    Returns:
+        tuple: (与paths一一对应的结果列表, 重新计算的文件数)
+    """
+    paths = [str(p) for p in paths]
+    cache = FileCache(cache_path)
+
+    values = []
+    todo = []
+    for i, path in enumerate(paths):
+        stat = os.stat(path)
+        value = cache.get(path, stat)
+        if value is None or (reuse and not reuse(value)):
+            todo.append((i, stat))
+        values.append(value)
+
+    if todo:
+        # 文件读取和cv2解码都会释放GIL，线程池即可并行
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for (i, stat), value in zip(todo, executor.map(func, [paths[i] for i, _ in todo])):
+                values[i] = value
+                cache.put(paths[i], value, stat)
+    cache.save(paths)
+    return values, len(todo)
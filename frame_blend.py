@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+帧间插值
+在相邻两张对齐照片之间合成过渡帧（交叉淡化或光流插值），让稀疏的每日照片播放更平滑
+以两帧滑动窗口的生成器方式工作，内存中只保留少量帧
+"""
+
+import cv2
+import numpy as np
+
+# 插值方式
+BLEND_MODES = ("crossfade", "flow")
+
+# 光流在缩小后的图像上计算（缩小倍数），速度快且足以描述头部的整体移动
+FLOW_DOWNSCALE = 4
+
+
+class _FlowInterpolator:
+    """
+    光流插值：在缩小的灰度图上计算Farneback光流，放大后沿光流方向双向映射再混合
+    映射网格和输出缓冲区只分配一次
+    """
+
+    def __init__(self, shape):
+        h, w = shape[:2]
+        self.size = (w, h)
+        self.small_size = (max(1, w // FLOW_DOWNSCALE), max(1, h // FLOW_DOWNSCALE))
+        grid_x, grid_y = np.meshgrid(np.arange(w, dtype=np.float32), np.arange(h, dtype=np.float32))
+        self.grid_x, self.grid_y = grid_x, grid_y
+        self.map_x = np.empty((h, w), dtype=np.float32)
+        self.map_y = np.empty((h, w), dtype=np.float32)
+        self.warped_prev = np.empty(shape, dtype=np.uint8)
+        self.warped_next = np.empty(shape, dtype=np.uint8)
+        self.flow_x = None
+        self.flow_y = None
+
+    def _small_gray(self, image):
+        return cv2.cvtColor(cv2.resize(image, self.small_size, interpolation=cv2.INTER_AREA),
+                            cv2.COLOR_BGR2GRAY)
+
+    def set_pair(self, prev, nxt):
+        """计算一对帧之间的光流（每对帧只计算一次）"""
+        flow = cv2.calcOpticalFlowFarneback(self._small_gray(prev), self._small_gray(nxt), None,
+                                            0.5, 3, 15, 3, 5, 1.2, 0)
+        flow = cv2.resize(flow, self.size, interpolation=cv2.INTER_LINEAR) * FLOW_DOWNSCALE
+        self.flow_x = np.ascontiguousarray(flow[..., 0])
+        self.flow_y = np.ascontiguousarray(flow[..., 1])
+
+    def blend(self, prev, nxt, t, out):
+        """合成时间位置t (0~1) 处的过渡帧，写入out"""
+        # 前一帧沿光流反向移动 t，后一帧沿光流正向移动 (1 - t)
+        np.multiply(self.flow_x, -t, out=self.map_x)
+        self.map_x += self.grid_x
+        np.multiply(self.flow_y, -t, out=self.map_y)
+        self.map_y += self.grid_y
+        cv2.remap(prev, self.map_x, self.map_y, cv2.INTER_LINEAR,
+                  dst=self.warped_prev, borderMode=cv2.BORDER_REPLICATE)
+
+        np.multiply(self.flow_x, 1 - t, out=self.map_x)
+        self.map_x += self.grid_x
+        np.multiply(self.flow_y, 1 - t, out=self.map_y)
+        self.map_y += self.grid_y
+        cv2.remap(nxt, self.map_x, self.map_y, cv2.INTER_LINEAR,
+                  dst=self.warped_next, borderMode=cv2.BORDER_REPLICATE)
+
+        cv2.addWeighted(self.warped_prev, 1 - t, self.warped_next, t, 0, dst=out)
+
+
+def interpolate_frames(frames, steps, mode="crossfade"):
+    """
+    在每对相邻帧之间插入steps张过渡帧
+
+    注意：过渡帧使用预分配的缓冲区，每次yield的数组会在下一次迭代时被覆盖，
+    调用方需要在取下一帧前用完（例如直接写入编码器），需要保留时请自行copy()
+
+    Args:
+        frames: 输入帧的可迭代对象（尺寸需一致）
+        steps: 每对相邻帧之间插入的过渡帧数
+        mode: "crossfade" 交叉淡化，"flow" 光流插值
+
+    Yields:
+        numpy.ndarray: 原始帧与过渡帧
+    """
+    if mode not in BLEND_MODES:
+        raise ValueError(f"不支持的插值方式: {mode}")
+
+    prev = None
+    out = None
+    flow = None
+    for frame in frames:
+        if prev is None or steps <= 0:
+            prev = frame
+            yield frame
+            continue
+
+        if frame.shape != prev.shape:
+            # 尺寸不一致时无法混合，直接切换
+            prev = frame
+            yield frame
+            continue
+
+        if out is None or out.shape != frame.shape:
+            out = np.empty_like(frame)
+            flow = _FlowInterpolator(frame.shape) if mode == "flow" else None
+
+        if flow is not None:
+            flow.set_pair(prev, frame)
+
+        for k in range(1, steps + 1):
+            t = k / (steps + 1)
+            if flow is not None:
+                flow.blend(prev, frame, t, out)
+            else:
+                cv2.addWeighted(prev, 1 - t, frame, t, 0, dst=out)
+            yield out
+
+        prev = frame
+        yield frame
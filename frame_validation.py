@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+编码前的帧完整性检查
+并行检查JPEG文件头、尺寸和结束标记（可选完整解码），结果按修改时间+大小缓存，
+在写入ffmpeg文件列表前排除或隔离损坏的帧
+"""
+
+import os
+import shutil
+import struct
+from collections import Counter
+from pathlib import Path
+
+import cv2
+
+from file_cache import map_cached
+
+# 检查结果缓存文件名（保存在帧目录中）
+CACHE_NAME = ".validation_cache.json"
+
+# 包含图像尺寸的SOF段标记（排除DHT=C4、JPG=C8、DAC=CC）
+SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def read_jpeg_header(path):
+    """
+    快速检查JPEG文件：起始标记、SOF段中的宽高和结束标记，不解码像素
+    按段长度跳过各段（EXIF、缩略图等），每段只读取段头，不读取段内容
+
+    Returns:
+        tuple: (宽, 高, 错误原因)，文件正常时错误原因为None
+    """
+    size = os.path.getsize(path)
+    if size == 0:
+        return None, None, "空文件"
+
+    with open(path, 'rb') as f:
+        if f.read(2) != b'\xff\xd8':
+            return None, None, "不是JPEG文件"
+        f.seek(max(0, size - 2))
+        if f.read(2) != b'\xff\xd9':
+            return None, None, "文件不完整（缺少结束标记）"
+
+        pos = 2
+        while True:
+            f.seek(pos)
+            head = f.read(4)
+            if len(head) < 4:  # 到达文件末尾仍未找到SOF
+                break
+            if head[0] != 0xFF:
+                return None, None, "文件头损坏"
+            marker = head[1]
+            if marker == 0xFF:  # 填充字节
+                pos += 1
+                continue
+            if marker == 0xDA:  # 图像数据开始前仍未找到SOF
+                break
+            if marker == 0x01 or 0xD0 <= marker <= 0xD8:  # 没有段长度的独立标记
+                pos += 2
+                continue
+            length = struct.unpack('>H', head[2:4])[0]
+            if length < 2:
+                return None, None, "文件头损坏"
+            if marker in SOF_MARKERS:
+                segment = f.read(5)
+                if len(segment) < 5:
+                    break
+                height, width = struct.unpack('>HH', segment[1:5])
+                if width == 0 or height == 0:
+                    return None, None, "图像尺寸为0"
+                return width, height, None
+            pos += 2 + length
+
+    return None, None, "未找到图像尺寸信息"
+
+
+def _check(path, full_decode):
+    """检查单个文件，返回结果字典"""
+    try:
+        width, height, reason = read_jpeg_header(path)
+        if reason is None and full_decode:
+            image = cv2.imread(str(path))
+            if image is None:
+                reason = "解码失败"
+            elif image.shape[1] != width or image.shape[0] != height:
+                reason = "解码尺寸与文件头不一致"
+    except OSError as e:
+        width, height, reason = None, None, f"无法读取: {e}"
+    return {"width": width, "height": height, "reason": reason, "decoded": full_decode}
+
+
+def validate_frames(paths, full_decode=False, workers=None, cache_path=None):
+    """
+    并行检查所有帧
+
+    Args:
+        paths: 帧文件路径列表
+        full_decode: 是否额外完整解码每一帧（更慢，但能发现数据段损坏）
+        workers: 并行线程数
+        cache_path: 结果缓存文件（None则不缓存）
+
+    Returns:
+        tuple: (正常帧路径列表, [(异常帧路径, 原因), ...])
+    """
+    paths = [str(p) for p in paths]
+    # 只复用检查通过的结果，异常帧每次重新检查（数量很少，修复后也能立即恢复）
+    checked, _ = map_cached(lambda path: _check(path, full_decode), paths, cache_path, workers,
+                            reuse=lambda r: r["reason"] is None and (r["decoded"] or not full_decode))
+    results = dict(zip(paths, checked))
+
+    # 尺寸与多数帧不一致的也视为异常（对齐后的帧应当尺寸相同）
+    sizes = Counter((r["width"], r["height"]) for r in results.values() if r["reason"] is None)
+    expected = sizes.most_common(1)[0][0] if sizes else None
+
+    valid, invalid = [], []
+    for path in paths:
+        result = results[path]
+        reason = result["reason"]
+        if reason is None and (result["width"], result["height"]) != expected:
+            reason = f"尺寸不一致 ({result['width']}x{result['height']}，应为{expected[0]}x{expected[1]})"
+        if reason is None:
+            valid.append(path)
+        else:
+            invalid.append((path, reason))
+
+    return valid, invalid
+
+
+def quarantine_frames(invalid, quarantine_dir):
+    """
+    把异常帧移动到隔离目录
+
+    Returns:
+        int: 移动的文件数
+    """
+    os.makedirs(quarantine_dir, exist_ok=True)
+    moved = 0
+    for path, _ in invalid:
+        try:
+            shutil.move(path, os.path.join(quarantine_dir, os.path.basename(path)))
+            moved += 1
+        except OSError as e:
+            print(f"⚠️ 无法隔离 {path}: {e}")
+    return moved
+
+
+def validate_directory(source_dir, full_decode=False, quarantine=False, workers=None):
+    """
+    检查目录中的所有jpg帧并报告结果
+
+    Returns:
+        list: 正常帧路径列表（已排序）
+    """
+    paths = sorted(Path(source_dir).glob("*.jpg"))
+    cache_path = os.path.join(str(source_dir), CACHE_NAME)
+    valid, invalid = validate_frames(paths, full_decode, workers, cache_path)
+
+    mode = "完整解码" if full_decode else "文件头"
+    print(f"🔍 帧检查（{mode}）: {len(valid)} 正常, {len(invalid)} 异常")
+    for path, reason in invalid:
+        print(f"   ❌ {os.path.basename(path)}: {reason}")
+
+    if invalid and quarantine:
+        quarantine_dir = os.path.join(str(source_dir), "quarantine")
+        moved = quarantine_frames(invalid, quarantine_dir)
+        print(f"   📦 已隔离 {moved} 个文件到: {quarantine_dir}")
+
+    return valid
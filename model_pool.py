@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+线程安全的人脸模型池
+MediaPipe图不支持并发调用 process()，模型池为每个并发调用方借出独占的
+FaceMesh + FaceDetection，数量有上限，空闲过久的图会被关闭释放内存
+
+    with FaceModelPool(max_faces=3) as pool:
+        with pool.models() as models:
+            faces = core.detect_faces(image, models.face_mesh)
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+from timelapse_core import logger
+
+# 默认最多同时存在的模型数（每套模型常驻内存约数十MB）
+DEFAULT_POOL_SIZE = 4
+
+# 空闲超过该秒数的模型会被关闭
+DEFAULT_IDLE_TIMEOUT = 300.0
+
+
+class FaceModels:
+    """一套人脸模型（FaceMesh + FaceDetection），同一时间只被一个线程使用"""
+
+    def __init__(self, max_faces=3):
+        # 只在真正创建模型时导入MediaPipe（通过factory注入模型时不需要）
+        import mediapipe as mp
+        
+        self.face_mesh = mp.solutions.face_mesh.FaceMesh(
+            static_image_mode=True,
+            max_num_faces=max_faces,
+            refine_landmarks=True,
+            min_detection_confidence=0.5)
+        self.face_detection = mp.solutions.face_detection.FaceDetection(
+            model_selection=0, min_detection_confidence=0.5)
+        self.last_used = time.monotonic()
+
+    def close(self):
+        for graph in (self.face_mesh, self.face_detection):
+            try:
+                graph.close()
+            except Exception as e:
+                logger.debug(f"关闭人脸模型时出错: {e}")
+
+
+class FaceModelPool:
+    """
+    人脸模型池
+
+    acquire() 优先借出最近归还的空闲模型，没有空闲模型且未达上限时新建，
+    达到上限时等待其他线程归还；每次借出/归还时顺便关闭空闲过久的模型
+    """
+
+    def __init__(self, max_faces=3, max_size=DEFAULT_POOL_SIZE, idle_timeout=DEFAULT_IDLE_TIMEOUT,
+                 factory=None):
+        """
+        Args:
+            max_faces: 单次推理最多检测的人脸数
+            max_size: 最多同时存在的模型数
+            idle_timeout: 空闲超过该秒数的模型被关闭（None则不关闭）
+            factory: 创建模型的函数（默认创建 FaceModels）
+        """
+        if max_size < 1:
+            raise ValueError("模型池大小必须至少为1")
+        self.max_faces = max_faces
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.factory = factory or (lambda: FaceModels(max_faces))
+        self._idle = []       # 空闲模型，末尾为最近归还的
+        self._size = 0        # 已创建（含借出中）的模型数
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def acquire(self, timeout=None):
+        """
+        借出一套模型（用完必须 release，建议使用 models() 上下文）
+
+        Args:
+            timeout: 达到上限时最长等待秒数（None为一直等待）
+
+        Returns:
+            FaceModels: 独占的模型
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise RuntimeError("模型池已关闭")
+                self._evict_idle_locked()
+                if self._idle:
+                    return self._idle.pop()
+                if self._size < self.max_size:
+                    self._size += 1
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f"等待人脸模型超时（已有{self.max_size}个在使用中）")
+                self._condition.wait(remaining)
+
+        # 在锁外创建模型，加载较慢，不阻塞其他线程归还
+        logger.info("正在初始化人脸检测模型...")
+        try:
+            models = self.factory()
+        except BaseException:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+        logger.info("人脸检测模型初始化完成")
+        return models
+
+    def release(self, models):
+        """归还模型（模型池已关闭时直接关闭该模型）"""
+        models.last_used = time.monotonic()
+        with self._condition:
+            if self._closed:
+                self._size -= 1
+                models.close()
+                return
+            self._idle.append(models)
+            self._evict_idle_locked()
+            self._condition.notify()
+
+    @contextmanager
+    def models(self, timeout=None):
+        """借出一套模型，离开with块时自动归还"""
+        models = self.acquire(timeout)
+        try:
+            yield models
+        finally:
+            self.release(models)
+
+    def _evict_idle_locked(self):
+        if self.idle_timeout is None:
+            return
+        now = time.monotonic()
+        expired = [m for m in self._idle if now - m.last_used > self.idle_timeout]
+        if not expired:
+            return
+        self._idle = [m for m in self._idle if now - m.last_used <= self.idle_timeout]
+        self._size -= len(expired)
+        for models in expired:
+            models.close()
+        logger.debug(f"已关闭{len(expired)}个空闲的人脸模型")
+        self._condition.notify_all()
+
+    def evict_idle(self):
+        """立即关闭空闲过久的模型"""
+        with self._condition:
+            self._evict_idle_locked()
+
+    @property
+    def size(self):
+        """已创建的模型数（含借出中的）"""
+        with self._condition:
+            return self._size
+
+    def close(self):
+        """关闭所有空闲模型，借出中的模型在归还时关闭（重复调用无副作用）"""
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._condition.notify_all()
+        for models in idle:
+            models.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
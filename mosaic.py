@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+逐年对比拼图视频
+按日历（同月同日/同周/同月）把不同年份的对齐照片分组，拼成网格画面，
+每个格子只解码并缩放一次，直接写入预分配的拼图缓冲区，再通过管道送入ffmpeg
+"""
+
+import argparse
+import math
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from create_timelapse import create_timelapse_video_from_frames
+from frame_validation import read_jpeg_header, validate_directory
+
+# 日历分组方式：名称 -> 由拍摄时间计算分组键的函数
+CALENDAR_KEYS = {
+    "day": lambda t: t.strftime("%m-%d"),
+    "week": lambda t: f"W{t.isocalendar()[1]:02d}",
+    "month": lambda t: t.strftime("%m"),
+}
+
+# 解码时可用的缩小倍数（对应 IMREAD_REDUCED_COLOR_2/4/8）
+REDUCED_READ_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+
+def photo_time(path):
+    """从文件名中的时间戳（aligned_photo_20250926_143022.jpg）解析拍摄时间，失败返回None"""
+    try:
+        return datetime.strptime(Path(path).stem[-15:], "%Y%m%d_%H%M%S")
+    except ValueError:
+        return None
+
+
+def group_by_calendar(paths, key="day", years=None):
+    """
+    按日历键和年份分组
+
+    同一年同一分组有多张照片时取最早的一张
+
+    Args:
+        paths: 帧文件路径列表
+        key: 分组方式（见 CALENDAR_KEYS）
+        years: 只使用这些年份（None则使用全部年份）
+
+    Returns:
+        tuple: (年份列表, [(分组键, {年份: 路径}), ...]) 分组按日历顺序排列
+    """
+    key_func = CALENDAR_KEYS[key]
+    groups = defaultdict(dict)
+    for path in sorted(str(p) for p in paths):
+        taken = photo_time(path)
+        if taken is None or (years and taken.year not in years):
+            continue
+        groups[key_func(taken)].setdefault(taken.year, path)
+
+    found = sorted({year for group in groups.values() for year in group})
+    return found, sorted(groups.items())
+
+
+def grid_shape(count):
+    """格子数量 -> (列数, 行数)，尽量接近正方形"""
+    cols = max(1, math.ceil(math.sqrt(count)))
+    rows = max(1, math.ceil(count / cols))
+    return cols, rows
+
+
+def _read_flag(source_size, tile_size):
+    """选择最大的缩小解码倍数，保证解码结果不小于格子尺寸（再用INTER_AREA缩放）"""
+    if source_size is None:
+        return cv2.IMREAD_COLOR
+    factor = 1
+    for candidate in sorted(REDUCED_READ_FLAGS):
+        if source_size[0] / candidate >= tile_size[0] and source_size[1] / candidate >= tile_size[1]:
+            factor = candidate
+    return REDUCED_READ_FLAGS[factor]
+
+
+class MosaicComposer:
+    """
+    拼图帧生成器
+
+    用两块预分配的缓冲区交替工作：当前画面送去编码时，线程池已在另一块缓冲区中
+    解码下一组照片，每个格子用 cv2.resize(dst=...) 直接写入缓冲区，不产生中间图像
+    """
+
+    def __init__(self, years, output_size=(1920, 1080), labels=True, workers=None, source_size=None):
+        """
+        Args:
+            years: 参与拼图的年份列表（按格子顺序）
+            output_size: 拼图画面尺寸 (宽, 高)
+            labels: 是否在格子左上角标注年份
+            workers: 解码线程数
+            source_size: 源照片尺寸，用于选择缩小解码倍数（None则完整解码）
+        """
+        self.years = list(years)
+        self.cols, self.rows = grid_shape(len(self.years))
+        width, height = output_size
+        # 格子尺寸取偶数，拼图画面按格子对齐（yuv420p要求偶数宽高）
+        self.tile_size = (width // self.cols // 2 * 2, height // self.rows // 2 * 2)
+        self.frame_size = (self.tile_size[0] * self.cols, self.tile_size[1] * self.rows)
+        self.labels = labels
+        self.read_flag = _read_flag(source_size, self.tile_size)
+        self.workers = workers or min(len(self.years), 16)
+        self._buffers = [np.zeros((self.frame_size[1], self.frame_size[0], 3), dtype=np.uint8)
+                         for _ in range(2)]
+        self._tiles = [[self._tile_view(buffer, i) for i in range(len(self.years))]
+                       for buffer in self._buffers]
+
+    def _tile_view(self, buffer, index):
+        tw, th = self.tile_size
+        row, col = divmod(index, self.cols)
+        return buffer[row * th:(row + 1) * th, col * tw:(col + 1) * tw]
+
+    def _fill_tile(self, tile, path, year):
+        """解码一张照片并缩放写入格子，缺失或读取失败的格子填黑"""
+        image = cv2.imread(path, self.read_flag) if path else None
+        if image is None:
+            tile[:] = 0
+        elif image.shape[1::-1] == self.tile_size:
+            tile[:] = image
+        else:
+            cv2.resize(image, self.tile_size, dst=tile, interpolation=cv2.INTER_AREA)
+        if self.labels:
+            scale = max(0.4, self.tile_size[1] / 540)
+            cv2.putText(tile, str(year), (int(12 * scale), int(36 * scale)), cv2.FONT_HERSHEY_SIMPLEX,
+                        scale, (255, 255, 255), max(1, int(2 * scale)), cv2.LINE_AA)
+
+    def _submit(self, executor, slot, group):
+        return [executor.submit(self._fill_tile, tile, group.get(year), year)
+                for tile, year in zip(self._tiles[slot], self.years)]
+
+    def frames(self, groups):
+        """
+        逐组生成拼图帧（返回的是复用的缓冲区，调用方需在下一次迭代前用完）
+
+        Args:
+            groups: [(分组键, {年份: 路径}), ...]
+
+        Yields:
+            numpy.ndarray: 拼图画面
+        """
+        if not groups:
+            return
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            pending = self._submit(executor, 0, groups[0][1])
+            for index in range(len(groups)):
+                slot = index % 2
+                for future in pending:
+                    future.result()
+                # 先提交下一组的解码，再把当前画面交给编码器
+                if index + 1 < len(groups):
+                    pending = self._submit(executor, 1 - slot, groups[index + 1][1])
+                else:
+                    pending = []
+                yield self._buffers[slot]
+
+
+def parse_size(value):
+    """解析 "1920x1080" 形式的尺寸"""
+    width, _, height = value.lower().partition("x")
+    return int(width), int(height)
+
+
+def create_mosaic_video(source_dir="aligned_photos", output_name="timelapse_mosaic.mp4", key="day",
+                        years=None, max_tiles=16, output_size=(1920, 1080), framerate=15, quality=20,
+                        labels=True, workers=None):
+    """
+    生成逐年对比拼图视频
+
+    Args:
+        source_dir: 对齐照片目录
+        key: 日历分组方式（day/week/month）
+        years: 指定年份（None则使用最近的 max_tiles 个年份）
+        max_tiles: 最多格子数（默认16，即4x4）
+
+    Returns:
+        bool: 是否成功
+    """
+    paths = validate_directory(source_dir)
+    found, groups = group_by_calendar(paths, key, years)
+    if not groups:
+        print(f"❌ 没有可用于拼图的照片: {source_dir}")
+        return False
+
+    selected = found[-max_tiles:]
+    if len(selected) < len(found):
+        print(f"⚠️ 共 {len(found)} 个年份，只使用最近的 {len(selected)} 个")
+    groups = [(name, group) for name, group in groups if any(year in group for year in selected)]
+
+    width, height, _ = read_jpeg_header(paths[0])
+    composer = MosaicComposer(selected, output_size, labels, workers,
+                              source_size=(width, height) if width else None)
+    print(f"🧩 拼图: {len(selected)} 个年份 ({composer.cols}x{composer.rows}), "
+          f"{len(groups)} 个分组, 格子 {composer.tile_size[0]}x{composer.tile_size[1]}")
+
+    return create_timelapse_video_from_frames(composer.frames(groups), output_name, framerate, quality,
+                                              total_frames=len(groups), scale=None)
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='逐年对比拼图视频')
+    parser.add_argument('--input', type=str, default='aligned_photos', help='对齐照片目录 (默认: aligned_photos)')
+    parser.add_argument('--output', type=str, default='timelapse_mosaic.mp4', help='输出视频 (默认: timelapse_mosaic.mp4)')
+    parser.add_argument('--key', choices=list(CALENDAR_KEYS), default='day',
+                        help='分组方式: day=同月同日, week=同一周, month=同月 (默认: day)')
+    parser.add_argument('--years', type=str, default=None, help='指定年份，逗号分隔，如 2023,2024,2025')
+    parser.add_argument('--max-tiles', type=int, default=16, help='最多格子数 (默认: 16，即4x4)')
+    parser.add_argument('--size', type=parse_size, default=(1920, 1080), help='画面尺寸 (默认: 1920x1080)')
+    parser.add_argument('--fps', type=int, default=15, help='帧率 (默认: 15)')
+    parser.add_argument('--quality', type=int, default=20, help='CRF质量 (默认: 20)')
+    parser.add_argument('--no-labels', action='store_true', help='不标注年份')
+    parser.add_argument('--workers', type=int, default=None, help='解码线程数')
+    args = parser.parse_args()
+
+    years = [int(y) for y in args.years.split(",")] if args.years else None
+    success = create_mosaic_video(args.input, args.output, args.key, years, args.max_tiles, args.size,
+                                  args.fps, args.quality, not args.no_labels, args.workers)
+    if success:
+        print(f"✅ 拼图视频已保存: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多规格输出
+从同一张对齐画面派生竖屏9:16、GIF缩略图等多种规格：
+每帧只读取一次，各规格只是在画面上切片再缩放，多个编码器在一次遍历中同时编码
+
+对齐照片档案是1920x1080，所有规格都不会比档案更清晰；
+4k_upscale 只是把档案画面放大到3840x2160，供只接受4K素材的平台使用
+"""
+
+import cv2
+
+from sinks import VideoSink, encode_to_sinks
+from timelapse_core import DEFAULT_TARGET_SIZE
+
+# 对齐画面的基准尺寸（所有裁切区域都以此为坐标系）
+BASE_SIZE = DEFAULT_TARGET_SIZE
+
+# 输出规格：
+#   size: 输出尺寸
+#   crop: 在基准画面上的裁切区域 (x, y, w, h)
+#   ext:  输出文件扩展名
+OUTPUT_PROFILES = {
+    "hd": {"size": (1920, 1080), "crop": (0, 0, 1920, 1080), "ext": "mp4"},
+    # 1080p档案放大2倍，并非真正的4K细节
+    "4k_upscale": {"size": (3840, 2160), "crop": (0, 0, 1920, 1080), "ext": "mp4"},
+    # 竖屏：以画面水平中心（眼睛中心所在位置）为中心裁出9:16，保持档案原始分辨率不放大
+    "vertical": {"size": (608, 1080), "crop": (960 - 304, 0, 608, 1080), "ext": "mp4"},
+    "thumb": {"size": (480, 270), "crop": (0, 0, 1920, 1080), "ext": "gif"},
+}
+
+# GIF输出参数：每帧单独生成调色板并立即映射（画质远好于默认调色板）；
+# 全局调色板要到输入结束才生成，ffmpeg会把整个缩略图序列缓存在内存中，不能用于流式编码
+GIF_OUTPUT_ARGS = ['-vf', 'split[a][b];[a]palettegen=stats_mode=single[p];[b][p]paletteuse=new=1',
+                   '-loop', '0']
+
+
+def parse_profiles(value):
+    """解析逗号分隔的规格名，如 "hd,vertical,thumb" """
+    names = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = [name for name in names if name not in OUTPUT_PROFILES]
+    if unknown:
+        raise ValueError(f"未知的输出规格: {', '.join(unknown)}（可选: {', '.join(OUTPUT_PROFILES)}）")
+    return names
+
+
+def slice_profiles(canvas, names):
+    """
+    从基准画面切出各规格的画面
+
+    Args:
+        canvas: 基准画面（尺寸为 BASE_SIZE）
+        names: 规格名列表
+
+    Returns:
+        dict: 规格名 -> 图像（尺寸与裁切区域一致时为画面的视图，不复制）
+    """
+    outputs = {}
+    for name in names:
+        profile = OUTPUT_PROFILES[name]
+        x, y, w, h = profile["crop"]
+        region = canvas[y:y + h, x:x + w]
+        size = profile["size"]
+        if (w, h) == size:
+            outputs[name] = region
+        else:
+            interpolation = cv2.INTER_AREA if size[0] < w else cv2.INTER_LINEAR
+            outputs[name] = cv2.resize(region, size, interpolation=interpolation)
+    return outputs
+
+
+def profile_sink(name, output_prefix="timelapse", framerate=15, quality=18, total_frames=None):
+    """为规格创建视频输出（GIF使用调色板参数，其余为H.264）"""
+    profile = OUTPUT_PROFILES[name]
+    output_name = f"{output_prefix}_{name}.{profile['ext']}"
+    output_args = GIF_OUTPUT_ARGS if profile["ext"] == "gif" else None
+    return VideoSink(output_name, framerate=framerate, quality=quality, scale=None,
+                     total_frames=total_frames, output_args=output_args, on_progress=None)
+
+
+def encode_profiles(frames, names, output_prefix="timelapse", framerate=15, quality=18, total_frames=None):
+    """
+    一次遍历已对齐的帧，同时编码所有规格（每个规格的吞吐量记录到渲染指标文件）
+
+    Args:
+        frames: 已对齐帧（BASE_SIZE）的可迭代对象
+        names: 规格名列表
+
+    Returns:
+        dict: 规格名 -> 是否成功
+    """
+    sinks = {name: profile_sink(name, output_prefix, framerate, quality, total_frames) for name in names}
+
+    def split(frame):
+        if frame.shape[1::-1] != BASE_SIZE:
+            frame = cv2.resize(frame, BASE_SIZE, interpolation=cv2.INTER_AREA)
+        return slice_profiles(frame, names)
+
+    return encode_to_sinks(frames, sinks, split, total_frames,
+                           metrics={name: {"profile": name} for name in names})
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+照片档案画质分析工具
+对整个照片档案计算清晰度、亮度、曝光直方图和偏色，用于发现摄像头长期的画质退化
+"""
+
+import argparse
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from file_cache import file_key
+
+# 直方图分箱数
+HIST_BINS = 16
+
+# 每个进程一次处理的照片数
+BATCH_SIZE = 64
+
+# 按列保存的标量指标
+METRIC_COLUMNS = ["sharpness", "brightness", "clip_dark", "clip_bright", "cast_a", "cast_b"]
+
+
+def _load_small(path):
+    """
+    读取1/4尺寸的图像（JPEG解码时直接缩小，比读取全图后再缩放快得多）
+    """
+    return cv2.imread(str(path), cv2.IMREAD_REDUCED_COLOR_4)
+
+
+def _batch_metrics(images):
+    """
+    对同尺寸的一批图像做向量化指标计算
+
+    Args:
+        images: (N, H, W, 3) 的uint8 BGR图像数组
+
+    Returns:
+        dict: 每个指标一个长度为N的数组，直方图为 (N, HIST_BINS)
+    """
+    n = images.shape[0]
+
+    # 灰度（ITU-R BT.601权重，与cv2.COLOR_BGR2GRAY一致）
+    gray = images @ np.array([0.114, 0.587, 0.299], dtype=np.float32)
+    pixels = gray.reshape(n, -1)
+
+    # 清晰度：拉普拉斯响应的方差
+    laplacian = (gray[:, :-2, 1:-1] + gray[:, 2:, 1:-1] +
+                 gray[:, 1:-1, :-2] + gray[:, 1:-1, 2:] - 4 * gray[:, 1:-1, 1:-1])
+    sharpness = laplacian.reshape(n, -1).var(axis=1)
+
+    # 曝光直方图：每张图的分箱加上行偏移后一次bincount完成
+    bins = np.minimum(pixels, 255).astype(np.int32) * HIST_BINS // 256
+    bins += (np.arange(n, dtype=np.int32) * HIST_BINS)[:, None]
+    hist = np.bincount(bins.ravel(), minlength=n * HIST_BINS).reshape(n, HIST_BINS)
+    hist = hist.astype(np.float32) / pixels.shape[1]
+
+    # 偏色：Lab空间a*/b*通道均值偏离中性灰(128)的程度
+    lab = cv2.cvtColor(images.reshape(-1, images.shape[2], 3), cv2.COLOR_BGR2LAB)
+    lab_mean = lab.reshape(n, -1, 3).mean(axis=1)
+
+    return {
+        "sharpness": sharpness,
+        "brightness": pixels.mean(axis=1),
+        "clip_dark": (pixels <= 5).mean(axis=1),
+        "clip_bright": (pixels >= 250).mean(axis=1),
+        "cast_a": lab_mean[:, 1] - 128,
+        "cast_b": lab_mean[:, 2] - 128,
+        "hist": hist,
+    }
+
+
+def analyze_batch(paths):
+    """
+    分析一批照片（在子进程中运行）
+
+    Returns:
+        tuple: (成功的路径列表, 指标字典)
+    """
+    groups = {}
+    for path in paths:
+        image = _load_small(path)
+        if image is None:
+            continue
+        groups.setdefault(image.shape, []).append((path, image))
+
+    done = []
+    columns = {name: [] for name in METRIC_COLUMNS + ["hist"]}
+    for items in groups.values():
+        metrics = _batch_metrics(np.stack([image for _, image in items]))
+        done.extend(path for path, _ in items)
+        for name in columns:
+            columns[name].append(metrics[name])
+
+    if not done:
+        return [], None
+    return done, {name: np.concatenate(values) for name, values in columns.items()}
+
+
+def _photo_time(name):
+    """从文件名中的时间戳（photo_20250926_143022.jpg）解析拍摄时间，失败返回0"""
+    stem = Path(name).stem
+    try:
+        return datetime.strptime(stem[-15:], "%Y%m%d_%H%M%S").timestamp()
+    except ValueError:
+        return 0.0
+
+
+def load_metrics(path):
+    """
+    读取已保存的指标文件
+
+    Returns:
+        dict: 列名 -> 数组，文件不存在时返回None
+    """
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files}
+
+
+def analyze_archive(photo_dir="photos", output="photo_metrics.npz", workers=None):
+    """
+    分析整个照片档案，按文件名+修改时间+大小缓存结果，只计算新增或改动过的照片
+
+    Returns:
+        dict: 所有照片的列式指标
+    """
+    files = sorted(Path(photo_dir).glob("*.jpg"))
+    keys = [file_key(f) for f in files]
+    names = np.array([key[0] for key in keys], dtype=str)
+    mtimes = np.array([key[1] for key in keys], dtype=np.int64)
+    sizes = np.array([key[2] for key in keys], dtype=np.int64)
+
+    # 复用缓存中文件名、修改时间和大小都一致的结果（指标文件只写入当前存在的照片，已删除的照片不会保留）
+    cached = load_metrics(output)
+    rows = {}
+    if cached is not None:
+        for i, name in enumerate(cached["name"]):
+            rows[(str(name), int(cached["mtime_ns"][i]), int(cached["size"][i]))] = i
+
+    todo = [str(f) for f, key in zip(files, keys) if key not in rows]
+    print(f"📷 共 {len(files)} 张照片，缓存命中 {len(files) - len(todo)} 张，需要分析 {len(todo)} 张")
+
+    computed = {}
+    if todo:
+        batches = [todo[i:i + BATCH_SIZE] for i in range(0, len(todo), BATCH_SIZE)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for done, metrics in executor.map(analyze_batch, batches):
+                for i, path in enumerate(done):
+                    computed[Path(path).name] = {name: metrics[name][i] for name in metrics}
+                print(f"  已分析 {len(computed)}/{len(todo)}")
+
+    # 组装列式结果（按文件名排序）
+    result = {name: [] for name in METRIC_COLUMNS + ["hist"]}
+    keep = []
+    for i, (name, key) in enumerate(zip(names, keys)):
+        row = rows.get(key)
+        if row is not None:
+            values = {col: cached[col][row] for col in result}
+        elif name in computed:
+            values = computed[name]
+        else:
+            print(f"⚠️ 无法读取: {name}")
+            continue
+        keep.append(i)
+        for col in result:
+            result[col].append(values[col])
+
+    keep = np.array(keep, dtype=np.int64)
+    columns = {
+        "name": names[keep],
+        "mtime_ns": mtimes[keep],
+        "size": sizes[keep],
+        "taken": np.array([_photo_time(n) for n in names[keep]], dtype=np.float64),
+    }
+    for col in METRIC_COLUMNS:
+        columns[col] = np.array(result[col], dtype=np.float32)
+    columns["hist"] = (np.array(result["hist"], dtype=np.float32)
+                       if result["hist"] else np.zeros((0, HIST_BINS), dtype=np.float32))
+
+    np.savez_compressed(output, **columns)
+    print(f"💾 指标已保存: {output}")
+    return columns
+
+
+def export_csv(columns, path):
+    """导出为CSV（直方图每个分箱一列）"""
+    header = ["name", "taken"] + METRIC_COLUMNS + [f"hist_{i}" for i in range(HIST_BINS)]
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for i in range(len(columns["name"])):
+            taken = datetime.fromtimestamp(columns["taken"][i]).isoformat() if columns["taken"][i] else ""
+            writer.writerow([columns["name"][i], taken] +
+                            [f"{columns[col][i]:.4f}" for col in METRIC_COLUMNS] +
+                            [f"{v:.4f}" for v in columns["hist"][i]])
+    print(f"📄 CSV已导出: {path}")
+
+
+def print_monthly_summary(columns):
+    """按月汇总中位数，便于发现清晰度下降、曝光或偏色的长期变化"""
+    taken = columns["taken"]
+    valid = taken > 0
+    if not valid.any():
+        return
+
+    months = np.array([datetime.fromtimestamp(t).strftime("%Y-%m") for t in taken[valid]])
+    print("\n📊 月度画质汇总（中位数）:")
+    print(f"  {'月份':<8} {'张数':>5} {'清晰度':>8} {'亮度':>7} {'欠曝%':>6} {'过曝%':>6} {'a*':>6} {'b*':>6}")
+    for month in np.unique(months):
+        mask = months == month
+        med = {col: np.median(columns[col][valid][mask]) for col in METRIC_COLUMNS}
+        print(f"  {month:<10} {mask.sum():>5} {med['sharpness']:>8.1f} {med['brightness']:>7.1f} "
+              f"{med['clip_dark'] * 100:>6.1f} {med['clip_bright'] * 100:>6.1f} "
+              f"{med['cast_a']:>6.1f} {med['cast_b']:>6.1f}")
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='照片档案画质分析工具')
+    parser.add_argument('--input', type=str, default='photos', help='照片目录 (默认: photos)')
+    parser.add_argument('--output', type=str, default='photo_metrics.npz', help='指标文件 (默认: photo_metrics.npz)')
+    parser.add_argument('--csv', type=str, default=None, help='同时导出为CSV文件')
+    parser.add_argument('--workers', type=int, default=None, help='并行进程数 (默认: CPU核心数)')
+    args = parser.parse_args()
+
+    print("📊 照片档案画质分析")
+    print("=" * 50)
+
+    if not Path(args.input).exists():
+        print(f"❌ 目录不存在: {args.input}")
+        return
+
+    columns = analyze_archive(args.input, args.output, args.workers)
+    if args.csv:
+        export_csv(columns, args.csv)
+    print_monthly_summary(columns)
+
+
+if __name__ == "__main__":
+    main()
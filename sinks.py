@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图像输出目标（Sink）
+处理流程只调用 sink.write(name, image)，由具体的Sink决定保存到磁盘、留在内存或送入视频编码器
+"""
+
+import os
+
+import cv2
+
+from ffmpeg_runner import FFmpegJob, report_job
+from timelapse_core import logger
+
+
+class Sink:
+    """输出目标基类，支持 with 语句"""
+
+    def write(self, name, image):
+        raise NotImplementedError
+
+    def close(self):
+        return True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class DiskSink(Sink):
+    """保存为图像文件"""
+
+    def __init__(self, directory, prefix=""):
+        self.directory = directory
+        self.prefix = prefix
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, name, image):
+        path = os.path.join(self.directory, f"{self.prefix}{name}")
+        if not cv2.imwrite(path, image):
+            raise IOError(f"无法写入文件: {path}")
+        return path
+
+
+class MemorySink(Sink):
+    """保存在内存中（images为 (名称, 图像) 列表），适合嵌入其他程序或测试"""
+
+    def __init__(self):
+        self.images = []
+
+    def write(self, name, image):
+        self.images.append((name, image))
+        return name
+
+
+class VideoSink(Sink):
+    """
+    通过管道把帧直接送入ffmpeg编码（不生成中间文件），实时显示编码进度
+    第一帧到达时才启动ffmpeg，之后的帧尺寸需与第一帧一致
+    """
+
+    def __init__(self, output_name, framerate=15, quality=18, scale="1920:1080",
+                 total_frames=None, on_progress=None, output_args=None, input_framerate=None):
+        """
+        Args:
+            framerate: 输出帧率
+            scale: 输出分辨率（ffmpeg scale滤镜参数），None则保持输入尺寸
+            total_frames: 预计总帧数（用于显示剩余时间）
+            on_progress: 进度回调（如 ffmpeg_runner.print_progress），默认不输出
+            output_args: 替换默认H.264编码参数的ffmpeg输出参数（如GIF）
+            input_framerate: 输入帧率，与输出帧率不同时由ffmpeg丢帧/补帧
+                             （与concat读取图片序列时的行为一致）；None则每帧按输出帧率播放
+        """
+        self.output_name = output_name
+        self.framerate = framerate
+        self.quality = quality
+        self.scale = scale
+        self.total_frames = total_frames
+        self.on_progress = on_progress
+        self.output_args = output_args
+        self.input_framerate = input_framerate or framerate
+        self.frame_count = 0
+        self.job = None
+        self._broken = False
+        self._closed = False
+
+    def _command(self, width, height):
+        cmd = [
+            'ffmpeg', '-y',  # 覆盖输出文件
+            '-f', 'rawvideo',  # 原始像素输入
+            '-pix_fmt', 'bgr24',
+            '-s', f'{width}x{height}',
+            '-r', str(self.input_framerate),  # 输入帧率
+            '-i', '-',                  # 从标准输入读取
+        ]
+        if self.input_framerate != self.framerate:
+            cmd += ['-r', str(self.framerate)]  # 输出帧率
+        if self.output_args is not None:
+            return cmd + list(self.output_args) + [self.output_name]
+        cmd += [
+            '-c:v', 'libx264',          # 视频编码器
+            '-crf', str(self.quality),  # 质量参数
+            '-pix_fmt', 'yuv420p',      # 像素格式
+        ]
+        if self.scale:
+            cmd += ['-vf', f'scale={self.scale}']  # 确保分辨率
+        return cmd + [self.output_name]
+
+    def _start(self, image):
+        height, width = image.shape[:2]
+        cmd = self._command(width, height)
+        logger.info("命令: %s", " ".join(cmd))
+        total_duration = self.total_frames / self.input_framerate if self.total_frames else None
+        self.job = FFmpegJob(cmd, total_duration=total_duration, feed_stdin=True,
+                             on_progress=self.on_progress).start()
+
+    def write(self, name, image):
+        """写入一帧，ffmpeg已退出时返回None"""
+        if self.job is None:
+            self._start(image)
+        if self._broken or not self.job.write(image.tobytes()):
+            # ffmpeg提前退出，错误信息在close时输出
+            self._broken = True
+            return None
+        self.frame_count += 1
+        return self.output_name
+
+    def cancel(self):
+        """取消编码"""
+        if self.job is not None:
+            self.job.cancel()
+
+    def close(self):
+        """
+        结束编码（重复调用无副作用）
+
+        Returns:
+            bool: 编码是否成功
+        """
+        if self.job is None:
+            return False
+        if not self._closed:
+            self._closed = True
+            self.job.wait()
+            if self.job.process.returncode != 0 and not self.job.cancelled:
+                logger.error("错误信息:\n%s", self.job.stderr_tail()[-800:])
+        return self.job.process.returncode == 0 and not self.job.cancelled
+
+
+def encode_to_sinks(frames, sinks, split=None, total_frames=None, metrics=None):
+    """
+    一次遍历帧序列，同时写入多个VideoSink，结束后逐个输出结果并记录渲染指标
+    Ctrl+C 或读取出错时取消所有编码
+
+    Args:
+        frames: BGR帧的可迭代对象，可以是生成器
+        sinks: 名称 -> VideoSink
+        split: 把一帧拆成 {名称: 图像} 的函数（None则每个sink写入同一帧）
+        total_frames: 预计总帧数（用于显示进度）
+        metrics: 名称 -> 额外写入渲染指标的字段
+
+    Returns:
+        dict: 名称 -> 是否成功
+    """
+    count = 0
+    try:
+        for frame in frames:
+            images = split(frame) if split else dict.fromkeys(sinks, frame)
+            for name, image in images.items():
+                sinks[name].write(None, image)
+            count += 1
+            if count % 25 == 0:
+                total = f"/{total_frames}" if total_frames else ""
+                print(f"\r   ⏳ {count}{total} 帧", end="", flush=True)
+    except BaseException:
+        # Ctrl+C 或读取出错：取消所有编码
+        for sink in sinks.values():
+            sink.cancel()
+        raise
+    print(f"\r   ⏳ {count} 帧")
+
+    if count == 0:
+        print("❌ 没有可编码的帧")
+        return dict.fromkeys(sinks, False)
+
+    results = {}
+    for name, sink in sinks.items():
+        sink.close()  # 失败时由sink输出错误信息
+        results[name] = report_job(sink.job, sink.output_name, show_stderr=False,
+                                   input_frames=sink.frame_count, framerate=sink.framerate,
+                                   **(metrics or {}).get(name, {}))
+    return results
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+人脸模型池测试（通过factory注入假模型，不需要摄像头和MediaPipe）
+运行: python -m unittest test_model_pool
+"""
+
+import threading
+import time
+import unittest
+
+from model_pool import FaceModelPool
+
+
+class FakeModels:
+    """假模型：记录是否被关闭、是否被并发使用"""
+
+    def __init__(self):
+        self.last_used = time.monotonic()
+        self.closed = False
+        self.busy = False
+
+    def close(self):
+        self.closed = True
+
+
+class FaceModelPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.created = []
+
+    def factory(self):
+        models = FakeModels()
+        self.created.append(models)
+        return models
+
+    def test_reuses_released_models(self):
+        with FaceModelPool(max_size=2, factory=self.factory) as pool:
+            with pool.models() as first:
+                pass
+            with pool.models() as second:
+                pass
+        self.assertIs(first, second)
+        self.assertEqual(len(self.created), 1)
+
+    def test_bounded_size_under_concurrency(self):
+        errors = []
+        pool = FaceModelPool(max_size=3, factory=self.factory)
+
+        def worker():
+            for _ in range(20):
+                with pool.models() as models:
+                    if models.busy:
+                        errors.append("同一套模型被并发使用")
+                    models.busy = True
+                    time.sleep(0.001)
+                    models.busy = False
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        pool.close()
+
+        self.assertEqual(errors, [])
+        self.assertLessEqual(len(self.created), 3)
+
+    def test_acquire_timeout_when_exhausted(self):
+        pool = FaceModelPool(max_size=1, factory=self.factory)
+        models = pool.acquire()
+        with self.assertRaises(TimeoutError):
+            pool.acquire(timeout=0.05)
+        pool.release(models)
+        pool.close()
+
+    def test_idle_eviction(self):
+        pool = FaceModelPool(max_size=2, idle_timeout=0.01, factory=self.factory)
+        with pool.models() as models:
+            pass
+        time.sleep(0.03)
+        pool.evict_idle()
+        self.assertTrue(models.closed)
+        self.assertEqual(pool.size, 0)
+        pool.close()
+
+    def test_close_while_borrowed(self):
+        pool = FaceModelPool(max_size=2, factory=self.factory)
+        idle = pool.acquire()
+        borrowed = pool.acquire()
+        pool.release(idle)
+
+        pool.close()
+        self.assertTrue(idle.closed)
+        self.assertFalse(borrowed.closed)
+
+        pool.release(borrowed)
+        self.assertTrue(borrowed.closed)
+        self.assertEqual(pool.size, 0)
+        with self.assertRaises(RuntimeError):
+            pool.acquire()
+
+    def test_close_wakes_waiting_threads(self):
+        pool = FaceModelPool(max_size=1, factory=self.factory)
+        models = pool.acquire()
+        result = []
+
+        def waiter():
+            try:
+                pool.acquire()
+            except RuntimeError:
+                result.append("closed")
+
+        thread = threading.Thread(target=waiter)
+        thread.start()
+        time.sleep(0.05)
+        pool.close()
+        thread.join(timeout=1)
+        self.assertEqual(result, ["closed"])
+        pool.release(models)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+人脸几何函数测试（使用合成关键点，不需要摄像头和MediaPipe）
+运行: python -m unittest test_timelapse_core
+"""
+
+import math
+import unittest
+
+import numpy as np
+
+import timelapse_core as core
+
+# MediaPipe FaceMesh（refine_landmarks=True）的关键点数量
+NUM_LANDMARKS = 478
+
+# 合成正脸的关键点相对眼睛中心的位置（像素，双眼外眼角相距200）
+FACE_LAYOUT = {
+    33: (-100, 0),     # 左眼外眼角
+    133: (-40, 0),     # 左眼内眼角
+    362: (40, 0),      # 右眼内眼角
+    263: (100, 0),     # 右眼外眼角
+    1: (0, 60),        # 鼻尖
+    61: (-60, 120),    # 左嘴角
+    291: (60, 120),    # 右嘴角
+    152: (0, 200),     # 下巴
+    10: (0, -120),     # 额头
+    234: (-150, 60),   # 左脸颊
+    454: (150, 60),    # 右脸颊
+}
+
+
+def synthetic_face(center=(960, 540), scale=1.0, roll=0.0, nose_offset=0.0, layout=None):
+    """
+    生成合成人脸关键点
+
+    Args:
+        center: 眼睛中心位置
+        scale: 缩放倍数
+        roll: 翻滚角（度）
+        nose_offset: 鼻尖沿双眼连线的偏移，单位为半眼距（模拟转头）
+        layout: 关键点布局（默认 FACE_LAYOUT）
+    """
+    layout = dict(layout or FACE_LAYOUT)
+    x, y = layout[1]
+    layout[1] = (x + nose_offset * 100, y)
+
+    # 未指定的关键点放在眼睛中心，不影响外接框
+    points = np.full((NUM_LANDMARKS, 2), center, dtype=np.float32)
+    offsets = np.array(list(layout.values()), dtype=np.float32) * scale
+    angle = math.radians(roll)
+    rotation = np.array([[math.cos(angle), -math.sin(angle)],
+                         [math.sin(angle), math.cos(angle)]], dtype=np.float32)
+    points[list(layout)] = offsets @ rotation.T + np.array(center, dtype=np.float32)
+    return points
+
+
+class HeadPoseTest(unittest.TestCase):
+
+    def test_frontal_face(self):
+        yaw, roll = core.head_pose(synthetic_face())
+        self.assertAlmostEqual(yaw, 0.0, places=3)
+        self.assertAlmostEqual(roll, 0.0, places=3)
+
+    def test_nose_offset_gives_yaw(self):
+        # 鼻尖偏移0.3个半眼距：眼角比例0.3、嘴角比例0.5，偏航 asin(0.4) ≈ 23.6°
+        yaw, _ = core.head_pose(synthetic_face(nose_offset=0.3))
+        self.assertAlmostEqual(yaw, math.degrees(math.asin(0.4)), places=2)
+        self.assertLess(yaw, core.QUALITY_THRESHOLDS['max_yaw'])
+
+        yaw_left, _ = core.head_pose(synthetic_face(nose_offset=-0.3))
+        self.assertAlmostEqual(yaw_left, -yaw, places=3)
+
+    def test_roll_does_not_change_yaw(self):
+        yaw, roll = core.head_pose(synthetic_face(roll=15, nose_offset=0.3))
+        self.assertAlmostEqual(roll, 15.0, places=3)
+        self.assertAlmostEqual(yaw, math.degrees(math.asin(0.4)), places=2)
+
+    def test_independent_of_position_and_scale(self):
+        expected = core.head_pose(synthetic_face(nose_offset=0.2))
+        moved = core.head_pose(synthetic_face(center=(300, 200), scale=0.5, nose_offset=0.2))
+        np.testing.assert_allclose(moved, expected, atol=1e-3)
+
+
+class FaceQualityTest(unittest.TestCase):
+
+    image_size = (1920, 1080)
+
+    def test_frontal_face_passes(self):
+        quality = core.face_quality(synthetic_face(), self.image_size, confidence=0.9)
+        self.assertTrue(quality['passed'])
+        self.assertEqual(quality['reasons'], [])
+        self.assertAlmostEqual(quality['face_ratio'], 300 / 1920, places=3)
+
+    def test_side_face_rejected(self):
+        quality = core.face_quality(synthetic_face(nose_offset=0.35), self.image_size)
+        self.assertFalse(quality['passed'])
+        self.assertTrue(quality['reasons'][0].startswith("侧脸"))
+
+    def test_tilted_head_rejected(self):
+        quality = core.face_quality(synthetic_face(roll=25), self.image_size)
+        self.assertFalse(quality['passed'])
+        self.assertTrue(quality['reasons'][0].startswith("头部倾斜"))
+
+    def test_face_size_limits(self):
+        small = core.face_quality(synthetic_face(scale=0.3), self.image_size)
+        self.assertTrue(small['reasons'][0].startswith("人脸过小"))
+        large = core.face_quality(synthetic_face(scale=6), self.image_size)
+        self.assertTrue(large['reasons'][0].startswith("人脸过大"))
+
+    def test_confidence_checked_only_when_given(self):
+        low = core.face_quality(synthetic_face(), self.image_size, confidence=0.3)
+        self.assertTrue(low['reasons'][0].startswith("置信度过低"))
+        unknown = core.face_quality(synthetic_face(), self.image_size)
+        self.assertTrue(unknown['passed'])
+        self.assertIsNone(unknown['confidence'])
+
+    def test_threshold_override(self):
+        points = synthetic_face(nose_offset=0.35)
+        quality = core.face_quality(points, self.image_size, thresholds={'max_yaw': 35})
+        self.assertTrue(quality['passed'])
+
+
+class SubjectSelectionTest(unittest.TestCase):
+
+    # 与 FACE_LAYOUT 几何形状不同的另一个人（脸更长、嘴更宽）
+    OTHER_LAYOUT = {**FACE_LAYOUT, 1: (0, 90), 61: (-80, 170), 291: (80, 170), 152: (0, 260)}
+
+    def test_signature_invariant_to_pose_and_distance(self):
+        expected = core.face_signature(synthetic_face())
+        moved = core.face_signature(synthetic_face(center=(400, 300), scale=0.6, roll=12))
+        np.testing.assert_allclose(moved, expected, atol=1e-4)
+
+    def test_single_face(self):
+        self.assertEqual(core.select_subject([synthetic_face()], "nearest"), 0)
+
+    def test_largest(self):
+        faces = [synthetic_face(scale=0.5), synthetic_face(center=(400, 400), scale=1.2)]
+        self.assertEqual(core.select_subject(faces, "largest"), 1)
+
+    def test_nearest(self):
+        faces = [synthetic_face(center=(400, 400), scale=1.2), synthetic_face(center=(1500, 500), scale=0.5)]
+        last = np.array([1480, 510], dtype=np.float32)
+        self.assertEqual(core.select_subject(faces, "nearest", last_eye_center=last), 1)
+        # 没有上一次的位置时退回选择最大的人脸
+        self.assertEqual(core.select_subject(faces, "nearest"), 0)
+
+    def test_signature(self):
+        subject = core.face_signature(synthetic_face(layout=self.OTHER_LAYOUT))
+        faces = [synthetic_face(center=(500, 500), scale=1.3),
+                 synthetic_face(center=(1400, 520), scale=0.7, roll=-8, layout=self.OTHER_LAYOUT)]
+        self.assertEqual(core.select_subject(faces, "signature", signature=subject), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
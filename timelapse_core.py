@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TimeLapse@Desk 核心处理函数
+基于NumPy数组的人脸检测、对齐和水印函数，不读写文件、不打印，便于嵌入其他批处理程序
+
+    import timelapse_core as core
+    faces = core.detect_faces(image, face_mesh)
+    landmarks = core.landmarks_from_points(faces[core.select_subject(faces)], len(faces))
+    aligned = core.align(image, landmarks)
+    result = core.watermark(aligned, core.watermark_time())
+"""
+
+import logging
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+# 统一的日志记录器，命令行程序通过 setup_logging 控制输出级别
+logger = logging.getLogger("timelapse")
+
+# 主体选择策略
+SUBJECT_STRATEGIES = ("largest", "nearest", "signature")
+
+# 用于计算人脸几何签名的关键点（眼角、鼻尖、嘴角、下巴、额头、脸颊两侧）
+SIGNATURE_LANDMARKS = [33, 133, 362, 263, 1, 61, 291, 152, 10, 234, 454]
+
+# 默认对齐输出尺寸
+DEFAULT_TARGET_SIZE = (1920, 1080)
+
+# 人脸质量门限：检测置信度、偏航角/翻滚角上限（度）、人脸宽度占画面宽度的比例范围
+QUALITY_THRESHOLDS = {
+    'min_confidence': 0.6,
+    'max_yaw': 25.0,
+    'max_roll': 20.0,
+    'min_face_ratio': 0.08,
+    'max_face_ratio': 0.8,
+}
+
+# 水印内容
+COPYRIGHT_TEXT = "Copyright Murphy"
+WATERMARK_PLACE = "Xi'An"
+
+
+def setup_logging(level="INFO", quiet=False):
+    """
+    配置命令行输出：只输出消息本身，quiet模式下只输出警告和错误
+    """
+    logging.basicConfig(format="%(message)s")
+    logger.setLevel(logging.WARNING if quiet else getattr(logging, str(level).upper()))
+
+
+def detect_faces(image, face_mesh):
+    """
+    单次推理检测图像中的所有人脸
+
+    Args:
+        image: BGR图像
+        face_mesh: MediaPipe FaceMesh实例
+
+    Returns:
+        list: 每张人脸一个 (N, 2) 的像素坐标关键点数组，未检测到时为空列表
+    """
+    rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    results = face_mesh.process(rgb_image)
+    if not results.multi_face_landmarks:
+        return []
+
+    h, w = image.shape[:2]
+    scale = np.array([w, h], dtype=np.float32)
+    return [
+        np.array([(lm.x, lm.y) for lm in face.landmark], dtype=np.float32) * scale
+        for face in results.multi_face_landmarks
+    ]
+
+
+def eye_center(points):
+    """双眼中心点"""
+    return (points[33] + points[263]) / 2
+
+
+def face_signature(points):
+    """
+    计算人脸几何签名：以眼睛中心为原点、双眼连线为x轴、
+    眼距为单位长度的归一化关键点坐标，与位置、旋转和远近无关
+
+    Args:
+        points: 人脸关键点数组 (N, 2)
+
+    Returns:
+        numpy.ndarray: 展平后的签名向量
+    """
+    left_eye, right_eye = points[33], points[263]
+    eye_vector = right_eye - left_eye
+    eye_dist = max(float(np.hypot(eye_vector[0], eye_vector[1])), 1e-6)
+    cos_a, sin_a = eye_vector / eye_dist
+    rotation = np.array([[cos_a, sin_a], [-sin_a, cos_a]], dtype=np.float32)
+    normalized = (points[SIGNATURE_LANDMARKS] - eye_center(points)) @ rotation.T / eye_dist
+    return normalized.ravel().astype(np.float32)
+
+
+def select_subject(faces, strategy="largest", last_eye_center=None, signature=None):
+    """
+    从多张人脸中选出拍摄主体（只使用已提取的关键点，不再次推理）
+
+    Args:
+        faces: detect_faces 返回的关键点数组列表
+        strategy: largest / nearest / signature
+        last_eye_center: 上一次主体的眼睛中心（nearest策略使用）
+        signature: 主体几何签名（signature策略使用）
+
+    Returns:
+        int: 主体人脸的索引
+    """
+    if len(faces) == 1:
+        return 0
+
+    if strategy == "nearest" and last_eye_center is not None:
+        distances = [np.linalg.norm(eye_center(pts) - last_eye_center) for pts in faces]
+        return int(np.argmin(distances))
+
+    if strategy == "signature" and signature is not None:
+        distances = [np.linalg.norm(face_signature(pts) - signature) for pts in faces]
+        return int(np.argmin(distances))
+
+    # 默认（或尚无历史状态时）选择最大的人脸（关键点外接框面积）
+    areas = [np.prod(pts.max(axis=0) - pts.min(axis=0)) for pts in faces]
+    return int(np.argmax(areas))
+
+
+def head_pose(points):
+    """
+    由已提取的眼、鼻、嘴关键点估计头部姿态（无需额外推理）
+
+    翻滚角为双眼连线的倾斜角；偏航角由鼻尖到左右眼角、左右嘴角的水平距离
+    不对称程度估计（正脸时两侧相等，转头时鼻尖偏向一侧）
+
+    Returns:
+        tuple: (偏航角, 翻滚角)，单位为度
+    """
+    left_eye, right_eye = points[33], points[263]
+    eye_vector = right_eye - left_eye
+    roll = float(np.degrees(np.arctan2(eye_vector[1], eye_vector[0])))
+
+    # 在双眼连线方向上比较水平距离，不受翻滚角影响
+    direction = eye_vector / max(float(np.hypot(eye_vector[0], eye_vector[1])), 1e-6)
+    nose = float(points[1] @ direction)
+    ratios = []
+    for left, right in ((33, 263), (61, 291)):
+        to_left = nose - float(points[left] @ direction)
+        to_right = float(points[right] @ direction) - nose
+        ratios.append((to_left - to_right) / max(to_left + to_right, 1e-6))
+    yaw = float(np.degrees(np.arcsin(np.clip(np.mean(ratios), -1.0, 1.0))))
+    return yaw, roll
+
+
+def detection_confidence(image, face_detection, points):
+    """
+    用FaceDetection获取主体人脸的检测置信度
+
+    Args:
+        image: BGR图像
+        face_detection: MediaPipe FaceDetection实例
+        points: 主体人脸关键点（用于匹配检测框）
+
+    Returns:
+        float: 检测框包含主体眼睛中心的最高置信度，未检测到时为0
+    """
+    results = face_detection.process(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+    if not results.detections:
+        return 0.0
+
+    h, w = image.shape[:2]
+    cx, cy = eye_center(points) / np.array([w, h], dtype=np.float32)
+    best = 0.0
+    for detection in results.detections:
+        box = detection.location_data.relative_bounding_box
+        if box.xmin <= cx <= box.xmin + box.width and box.ymin <= cy <= box.ymin + box.height:
+            best = max(best, float(detection.score[0]))
+    return best
+
+
+def face_quality(points, image_size, confidence=None, thresholds=None):
+    """
+    评估人脸质量，判断是否值得对齐和编码
+
+    Args:
+        points: 主体人脸关键点数组 (N, 2)
+        image_size: 图像尺寸 (宽, 高)
+        confidence: 检测置信度（None则不检查）
+        thresholds: 门限字典（缺省项使用 QUALITY_THRESHOLDS）
+
+    Returns:
+        dict: yaw / roll / face_ratio / confidence / passed / reasons
+    """
+    limits = dict(QUALITY_THRESHOLDS, **(thresholds or {}))
+    yaw, roll = head_pose(points)
+    face_ratio = float(points[:, 0].max() - points[:, 0].min()) / image_size[0]
+
+    reasons = []
+    if confidence is not None and confidence < limits['min_confidence']:
+        reasons.append(f"置信度过低 ({confidence:.2f})")
+    if abs(yaw) > limits['max_yaw']:
+        reasons.append(f"侧脸 (偏航 {yaw:.0f}°)")
+    if abs(roll) > limits['max_roll']:
+        reasons.append(f"头部倾斜 (翻滚 {roll:.0f}°)")
+    if face_ratio < limits['min_face_ratio']:
+        reasons.append(f"人脸过小 ({face_ratio:.0%})")
+    elif face_ratio > limits['max_face_ratio']:
+        reasons.append(f"人脸过大 ({face_ratio:.0%})")
+
+    return {
+        'yaw': round(yaw, 1),
+        'roll': round(roll, 1),
+        'face_ratio': round(face_ratio, 3),
+        'confidence': None if confidence is None else round(confidence, 3),
+        'passed': not reasons,
+        'reasons': reasons,
+    }
+
+
+def landmarks_from_points(points, num_faces=1):
+    """
+    关键点数组转换为关键点字典
+
+    Returns:
+        dict: 包含关键点信息的字典
+    """
+    landmarks = [(int(x), int(y)) for x, y in points]
+
+    return {
+        'all_landmarks': landmarks,
+        'left_eye': landmarks[33],     # 左眼
+        'right_eye': landmarks[263],   # 右眼
+        'nose_tip': landmarks[1],      # 鼻尖
+        'mouth_left': landmarks[61],   # 嘴角
+        'mouth_right': landmarks[291],
+        'num_faces': num_faces,
+    }
+
+
+def alignment_matrix(landmarks, target_size=DEFAULT_TARGET_SIZE):
+    """
+    计算对齐变换矩阵：以眼睛中心为旋转点校正角度（不缩放），
+    并把眼睛中心平移到目标图像水平居中、40%高度处
+
+    Returns:
+        numpy.ndarray: 2x3 仿射矩阵
+    """
+    left_eye = np.array(landmarks['left_eye'])
+    right_eye = np.array(landmarks['right_eye'])
+
+    # 计算眼睛中心点
+    center = (left_eye + right_eye) / 2
+
+    # 计算眼睛之间的角度（用于旋转对齐）
+    eye_vector = right_eye - left_eye
+    angle = np.degrees(np.arctan2(eye_vector[1], eye_vector[0]))
+
+    # 定义固定的目标位置（眼睛中心在图像上部40%处）
+    target_eye_center = np.array([target_size[0] / 2, target_size[1] * 0.4])
+
+    # 创建变换矩阵：只旋转，不缩放（scale=1.0）
+    matrix = cv2.getRotationMatrix2D(tuple(center), angle, 1.0)
+
+    # 计算平移量，将眼睛中心移动到目标位置
+    matrix[0, 2] += target_eye_center[0] - center[0]
+    matrix[1, 2] += target_eye_center[1] - center[1]
+    return matrix
+
+
+def align(image, landmarks, target_size=DEFAULT_TARGET_SIZE):
+    """
+    对齐人脸到固定位置（不缩放，只平移和旋转）
+
+    Returns:
+        numpy.ndarray: 对齐后的图像，landmarks为None时返回None
+    """
+    if landmarks is None:
+        return None
+
+    # 应用变换，超出部分裁切，空白部分填充黑色
+    return cv2.warpAffine(
+        image,
+        alignment_matrix(landmarks, target_size),
+        target_size,
+        borderMode=cv2.BORDER_CONSTANT,  # 边界填充模式
+        borderValue=(0, 0, 0)            # 黑色填充
+    )
+
+
+def watermark_time(dt=None, place=WATERMARK_PLACE):
+    """水印时间地点文本，如 "2025/09/26 14:30 Xi'An" """
+    dt = dt or datetime.now()
+    return f"{dt.strftime('%Y/%m/%d %H:%M')} {place}"
+
+
+def watermark(image, timestamp, alpha=0.7, copyright_text=COPYRIGHT_TEXT):
+    """
+    在图像右下角添加半透明水印（不修改输入图像）
+
+    Args:
+        image: 输入图像
+        timestamp: 时间戳字符串
+        alpha: 透明度 (0.0-1.0，0为完全透明，1为完全不透明)
+        copyright_text: 版权文本
+
+    Returns:
+        numpy.ndarray: 添加水印后的图像
+    """
+    # 复制图像以避免修改原图
+    watermarked_image = image.copy()
+
+    # 字体设置 - 使用更清晰的字体
+    font = cv2.FONT_HERSHEY_DUPLEX  # 更接近Consolas的等宽字体效果
+    font_scale = 0.6
+    thickness = 1
+    color = (255, 255, 255)  # 白色
+
+    # 获取图像尺寸
+    height, width = watermarked_image.shape[:2]
+
+    # 计算文本尺寸
+    (copyright_w, copyright_h), _ = cv2.getTextSize(copyright_text, font, font_scale, thickness)
+    (time_w, time_h), _ = cv2.getTextSize(timestamp, font, font_scale, thickness)
+
+    # 设置水印位置（距离边界有一定距离）
+    margin_right = 30  # 距离右边界
+    margin_bottom = 30  # 距离下边界
+    line_spacing = 8   # 行间距
+
+    copyright_x = width - copyright_w - margin_right
+    copyright_y = height - time_h - margin_bottom - line_spacing
+    time_x = width - time_w - margin_right
+    time_y = height - margin_bottom
+
+    # 创建透明层
+    overlay = watermarked_image.copy()
+
+    # 在透明层上绘制文字（无描边，清晰效果）
+    cv2.putText(overlay, copyright_text, (copyright_x, copyright_y),
+                font, font_scale, color, thickness, cv2.LINE_AA)
+    cv2.putText(overlay, timestamp, (time_x, time_y),
+                font, font_scale, color, thickness, cv2.LINE_AA)
+
+    # 使用alpha混合实现透明效果
+    cv2.addWeighted(overlay, alpha, watermarked_image, 1 - alpha, 0, watermarked_image)
+
+    return watermarked_image
@@ -8,152 +8,176 @@ TimeLapse@Desk Demo (优化版 + 水印功能)
 import cv2
 import numpy as np
 import os
-from datetime import datetime
-import mediapipe as mp
+from datetime import datetime, timedelta
 import argparse
+import csv
+import json
+import threading
+import time
+
+import timelapse_core as core
+from camera_profile import DEFAULT_PROFILE_PATH, apply_camera_profile, load_camera_profile
+from model_pool import DEFAULT_POOL_SIZE, FaceModelPool
+from sinks import DiskSink
+from timelapse_core import SUBJECT_STRATEGIES, logger, setup_logging
+
+# 默认的主体追踪状态文件名（保存在原始照片目录中）
+SUBJECT_STATE_NAME = "subject_state.json"
+
+# 命令行模式下的人脸质量记录文件名（保存在原始照片目录中）
+QUALITY_LOG_NAME = "face_quality.jsonl"
+
+# 间隔拍摄的最小间隔（秒）：文件名只精确到秒，更短的间隔会覆盖上一张照片
+MIN_INTERVAL = 1.0
 
 class TimeLapseCamera:
-    def __init__(self, output_dir="photos", aligned_dir="aligned_photos"):
+    def __init__(self, output_dir="photos", aligned_dir="aligned_photos",
+                 max_faces=3, subject="largest", state_path=None,
+                 profile_path=DEFAULT_PROFILE_PATH, raw_sink=None, aligned_sink=None,
+                 quality_gate=True, quality_thresholds=None, quality_log_path=None, model_pool=None):
         """
         初始化TimeLapse相机
         
         Args:
             output_dir: 原始照片保存目录
             aligned_dir: 对齐后照片保存目录
+            max_faces: 单次推理最多检测的人脸数
+            subject: 多人脸时的主体选择策略（largest / nearest / signature）
+            state_path: 主体追踪状态文件，保存上一次的眼睛中心和主体几何签名，
+                        每日单次运行时据此延续追踪（None则只保存在内存中）
+            profile_path: 摄像头能力档案缓存文件（由camera_test.py生成）
+            raw_sink: 原始照片的输出目标（默认保存到output_dir）
+            aligned_sink: 对齐照片的输出目标（默认保存到aligned_dir）
+            quality_gate: 是否在对齐前检查人脸质量（置信度、姿态、大小），不合格的照片不对齐
+            quality_thresholds: 质量门限（缺省项见 timelapse_core.QUALITY_THRESHOLDS）
+            quality_log_path: 人脸质量记录文件（JSON Lines），None则不写文件，
+                              检查结果只在 detect_face_landmarks 返回的 'quality' 中和DEBUG日志里
+            model_pool: 共享的人脸模型池（None则在首次检测时自建，close时关闭）
         """
+        if subject not in SUBJECT_STRATEGIES:
+            raise ValueError(f"不支持的主体选择策略: {subject}")
+        
         self.output_dir = output_dir
         self.aligned_dir = aligned_dir
+        self.max_faces = max(1, int(max_faces))
+        self.subject = subject
+        self.state_path = state_path
+        self.profile_path = profile_path
+        self.quality_gate = quality_gate
+        self.quality_thresholds = dict(quality_thresholds or {})
+        # 人脸质量记录（每张照片一行JSON，包括被拒绝的原因），多线程追加时加锁
+        self.quality_log_path = quality_log_path
+        self._quality_log_lock = threading.Lock()
+        
+        # 输出目标：默认保存到目录，也可传入MemorySink/VideoSink等
+        self.raw_sink = raw_sink if raw_sink is not None else DiskSink(output_dir)
+        self.aligned_sink = aligned_sink if aligned_sink is not None else DiskSink(aligned_dir, prefix="aligned_")
+        
+        # 主体追踪状态：上一次的眼睛中心和主体几何签名
+        self._last_eye_center, self._subject_signature = self._load_state()
+        
+        # 最近一次读取到画面的单调时钟时间（用于间隔拍摄的时间记录）
+        self.last_capture_time = None
+        # 上一张照片的文件名（避免同一秒内的两张照片互相覆盖）
+        self._last_filename = None
+        
+        # 人脸模型池（延迟初始化以提高启动速度）：每个并发调用方独占一套MediaPipe图
+        if model_pool is not None and model_pool.max_faces != self.max_faces:
+            logger.warning(f"共享模型池的最多人脸数为{model_pool.max_faces}，"
+                           f"与max_faces={self.max_faces}不一致，以模型池为准")
+            self.max_faces = model_pool.max_faces
+        self.model_pool = model_pool
+        self._owns_pool = model_pool is None
+        self._pool_lock = threading.Lock()
+        # 主体追踪状态在多个线程间共享
+        self._state_lock = threading.Lock()
+    
+    def _init_mediapipe(self, preload=False):
+        """
+        延迟初始化人脸模型池（只有在需要人脸检测时才初始化）
         
-        # 创建保存目录
-        os.makedirs(output_dir, exist_ok=True)
-        os.makedirs(aligned_dir, exist_ok=True)
-        
-        # MediaPipe相关变量（延迟初始化以提高启动速度）
-        self.mp_face_detection = None
-        self.mp_face_mesh = None
-        self.mp_drawing = None
-        self.face_detection = None
-        self.face_mesh = None
-        self._mediapipe_initialized = False
+        Args:
+            preload: 是否立即加载一套模型（避免首次检测时等待）
+            
+        Returns:
+            FaceModelPool: 模型池（在锁内取得，不受同时调用的 close() 影响）
+        """
+        with self._pool_lock:
+            if self.model_pool is None:
+                self.model_pool = FaceModelPool(self.max_faces, max_size=DEFAULT_POOL_SIZE)
+            pool = self.model_pool
+        if preload:
+            with pool.models():
+                pass
+        return pool
     
-    def _init_mediapipe(self):
+    def close(self):
         """
-        延迟初始化MediaPipe（只有在需要人脸检测时才初始化）
+        释放自建的人脸模型池（传入的共享模型池由调用方关闭）
         """
-        if not self._mediapipe_initialized:
-            print("正在初始化人脸检测模型...")
-            self.mp_face_detection = mp.solutions.face_detection
-            self.mp_face_mesh = mp.solutions.face_mesh
-            self.mp_drawing = mp.solutions.drawing_utils
-            
-            # 初始化人脸检测器
-            self.face_detection = self.mp_face_detection.FaceDetection(
-                model_selection=0, min_detection_confidence=0.5)
-            self.face_mesh = self.mp_face_mesh.FaceMesh(
-                static_image_mode=True,
-                max_num_faces=1,
-                refine_landmarks=True,
-                min_detection_confidence=0.5)
-            
-            self._mediapipe_initialized = True
-            print("人脸检测模型初始化完成")
+        with self._pool_lock:
+            if self._owns_pool and self.model_pool is not None:
+                self.model_pool.close()
+                self.model_pool = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
     
     def _add_watermark(self, image, timestamp, alpha=0.7):
         """
-        在图像右下角添加半透明水印
-        
-        Args:
-            image: 输入图像
-            timestamp: 时间戳字符串
-            alpha: 透明度 (0.0-1.0，0为完全透明，1为完全不透明)
-            
-        Returns:
-            numpy.ndarray: 添加水印后的图像
+        在图像右下角添加半透明水印（见 timelapse_core.watermark）
         """
-        # 复制图像以避免修改原图
-        watermarked_image = image.copy()
-        
-        # 水印文本 - 使用稳定的版权标记
-        copyright_text = "Copyright Murphy" 
-        time_text = timestamp
-        
-        # 字体设置 - 使用更清晰的字体
-        font = cv2.FONT_HERSHEY_DUPLEX  # 更接近Consolas的等宽字体效果
-        font_scale = 0.6
-        thickness = 1
-        color = (255, 255, 255)  # 白色
-        
-        # 获取图像尺寸
-        height, width = watermarked_image.shape[:2]
-        
-        # 计算文本尺寸
-        (copyright_w, copyright_h), _ = cv2.getTextSize(copyright_text, font, font_scale, thickness)
-        (time_w, time_h), _ = cv2.getTextSize(time_text, font, font_scale, thickness)
-        
-        # 设置水印位置（距离边界有一定距离）
-        margin_right = 30  # 距离右边界
-        margin_bottom = 30  # 距离下边界
-        line_spacing = 8   # 行间距
-        
-        copyright_x = width - copyright_w - margin_right
-        copyright_y = height - time_h - margin_bottom - line_spacing
-        time_x = width - time_w - margin_right  
-        time_y = height - margin_bottom
-        
-        # 创建透明层
-        overlay = watermarked_image.copy()
-        
-        # 在透明层上绘制文字（无描边，清晰效果）
-        cv2.putText(overlay, copyright_text, (copyright_x, copyright_y), 
-                   font, font_scale, color, thickness, cv2.LINE_AA)
-        cv2.putText(overlay, time_text, (time_x, time_y), 
-                   font, font_scale, color, thickness, cv2.LINE_AA)
-        
-        # 使用alpha混合实现透明效果
-        cv2.addWeighted(overlay, alpha, watermarked_image, 1 - alpha, 0, watermarked_image)
-        
-        return watermarked_image
+        return core.watermark(image, timestamp, alpha)
     
     def _display_camera_settings(self, cap):
         """
         显示摄像头实际设置的参数
         """
-        print("摄像头当前设置:")
-        print(f"  分辨率: {int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))}x{int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))}")
-        print(f"  帧率: {cap.get(cv2.CAP_PROP_FPS):.1f} FPS")
-        print(f"  亮度: {cap.get(cv2.CAP_PROP_BRIGHTNESS):.2f}")
-        print(f"  对比度: {cap.get(cv2.CAP_PROP_CONTRAST):.2f}")
-        print(f"  饱和度: {cap.get(cv2.CAP_PROP_SATURATION):.2f}")
-        print(f"  锐度: {cap.get(cv2.CAP_PROP_SHARPNESS):.2f}")
-        print(f"  曝光: {cap.get(cv2.CAP_PROP_EXPOSURE):.2f}")
-        print(f"  增益: {cap.get(cv2.CAP_PROP_GAIN):.2f}")
-        print(f"  自动对焦: {'开启' if cap.get(cv2.CAP_PROP_AUTOFOCUS) else '关闭'}")
-        print(f"  自动白平衡: {'开启' if cap.get(cv2.CAP_PROP_AUTO_WB) else '关闭'}")
+        logger.info("摄像头当前设置:")
+        logger.info(f"  分辨率: {int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))}x{int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))}")
+        logger.info(f"  帧率: {cap.get(cv2.CAP_PROP_FPS):.1f} FPS")
+        logger.info(f"  亮度: {cap.get(cv2.CAP_PROP_BRIGHTNESS):.2f}")
+        logger.info(f"  对比度: {cap.get(cv2.CAP_PROP_CONTRAST):.2f}")
+        logger.info(f"  饱和度: {cap.get(cv2.CAP_PROP_SATURATION):.2f}")
+        logger.info(f"  锐度: {cap.get(cv2.CAP_PROP_SHARPNESS):.2f}")
+        logger.info(f"  曝光: {cap.get(cv2.CAP_PROP_EXPOSURE):.2f}")
+        logger.info(f"  增益: {cap.get(cv2.CAP_PROP_GAIN):.2f}")
+        logger.info(f"  自动对焦: {'开启' if cap.get(cv2.CAP_PROP_AUTOFOCUS) else '关闭'}")
+        logger.info(f"  自动白平衡: {'开启' if cap.get(cv2.CAP_PROP_AUTO_WB) else '关闭'}")
     
-    def capture_photo(self, camera_index=0):
+    def open_camera(self, camera_index=0):
         """
-        拍摄照片（优化版）
+        打开摄像头并完成参数设置和预热（可在多次拍摄间复用）
         
         Args:
             camera_index: 摄像头索引，默认为0
             
         Returns:
-            tuple: (成功标志, 照片数组, 文件名)
+            cv2.VideoCapture: 已就绪的摄像头对象，失败时返回None
         """
-        try:
-            print("正在初始化摄像头...")
-            # 初始化摄像头
-            cap = cv2.VideoCapture(camera_index)
-            if not cap.isOpened():
-                print("错误：无法打开摄像头")
-                return False, None, None
-            
+        logger.info("正在初始化摄像头...")
+        # 初始化摄像头
+        cap = cv2.VideoCapture(camera_index)
+        if not cap.isOpened():
+            logger.error("错误：无法打开摄像头")
+            return None
+        
+        profile = load_camera_profile(camera_index, self.profile_path)
+        if profile is not None:
+            # 按缓存的能力档案设置，只应用摄像头支持的参数
+            applied = apply_camera_profile(cap, profile)
+            logger.info(f"已按摄像头档案应用{applied}项设置")
+        else:
+            logger.info("未找到摄像头档案（可运行 camera_test.py 生成），使用默认设置")
             # 设置摄像头参数（最大化图像质量）
             cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1920)   # 最大分辨率
             cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 1080)
             cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)       # 减少缓冲区延迟
             cap.set(cv2.CAP_PROP_FPS, 30)             # 适中帧率
-            
+        
             # 图像质量优化设置（针对你的摄像头特点优化）
             # 只设置摄像头实际支持的参数
             try:
@@ -162,68 +186,145 @@ class TimeLapseCamera:
                 cap.set(cv2.CAP_PROP_SATURATION, 145)     # 稍微提高饱和度
                 cap.set(cv2.CAP_PROP_SHARPNESS, 140)      # 提高锐度
             except:
-                print("某些图像参数设置失败，使用默认值")
-            
+                logger.warning("某些图像参数设置失败，使用默认值")
+        
             # 尝试启用自动功能（如果支持的话）
             try:
                 cap.set(cv2.CAP_PROP_AUTO_WB, 1)          # 尝试启用自动白平衡
                 cap.set(cv2.CAP_PROP_AUTOFOCUS, 1)        # 尝试启用自动对焦
             except:
                 pass  # 如果不支持就忽略
+        
+        logger.info("摄像头参数设置完成，正在优化图像质量...")
+        
+        # 显示实际设置的参数
+        self._display_camera_settings(cap)
+        
+        logger.info("摄像头预热中...")
+        # 预热摄像头，让相机调整到最佳状态（提高照片质量）
+        for i in range(10):  # 增加预热帧数，让相机充分调整
+            ret, frame = cap.read()
+            if not ret:
+                logger.warning(f"预热第{i+1}帧失败")
+                break
+            # 显示预热进度
+            if (i + 1) % 3 == 0:
+                logger.info(f"预热中... {i+1}/10")
+        
+        # 额外等待，让自动对焦和曝光稳定
+        time.sleep(1)  # 等待1秒让相机稳定
+        
+        return cap
+    
+    def _save_photo(self, frame):
+        """
+        为照片添加水印并写入原始照片输出目标
+        
+        Args:
+            frame: 摄像头拍摄的图像
             
-            print("摄像头参数设置完成，正在优化图像质量...")
-            
-            # 显示实际设置的参数
-            self._display_camera_settings(cap)
-            
-            print("摄像头预热中...")
-            # 预热摄像头，让相机调整到最佳状态（提高照片质量）
-            for i in range(10):  # 增加预热帧数，让相机充分调整
-                ret, frame = cap.read()
-                if not ret:
-                    print(f"预热第{i+1}帧失败")
-                    break
-                # 显示预热进度
-                if (i + 1) % 3 == 0:
-                    print(f"预热中... {i+1}/10")
+        Returns:
+            str: 文件名
+        """
+        # 生成文件名（基于当前时间）
+        now = datetime.now()
+        filename = f"photo_{now.strftime('%Y%m%d_%H%M%S')}.jpg"
+        if filename == self._last_filename:
+            # 与上一张落在同一秒（间隔拍摄时偶尔出现），等到下一秒再命名，避免覆盖
+            time.sleep(1.0 - now.microsecond / 1e6)
+            now = datetime.now()
+            filename = f"photo_{now.strftime('%Y%m%d_%H%M%S')}.jpg"
+        self._last_filename = filename
+        
+        # 添加水印并保存
+        watermarked_frame = core.watermark(frame, core.watermark_time(now))
+        location = self.raw_sink.write(filename, watermarked_frame)
+        logger.info(f"照片已保存: {location}")
+        
+        return filename
+    
+    def capture_photo(self, camera_index=0, cap=None):
+        """
+        拍摄照片（优化版）
+        
+        Args:
+            camera_index: 摄像头索引，默认为0
+            cap: 已打开的摄像头（由open_camera返回）；为None时临时打开并在拍摄后释放
             
-            # 额外等待，让自动对焦和曝光稳定
-            import time
-            time.sleep(1)  # 等待1秒让相机稳定
+        Returns:
+            tuple: (成功标志, 照片数组, 文件名)
+        """
+        owns_camera = cap is None
+        try:
+            if owns_camera:
+                cap = self.open_camera(camera_index)
+                if cap is None:
+                    return False, None, None
+            else:
+                # 复用摄像头时先丢弃缓冲区中的旧帧，保证拍到的是当前画面
+                cap.grab()
             
-            print("正在拍摄...")
+            logger.info("正在拍摄...")
             # 拍摄最终照片
             ret, frame = cap.read()
-            cap.release()
+            self.last_capture_time = time.monotonic()
             
             if not ret:
-                print("错误：无法拍摄照片")
+                logger.error("错误：无法拍摄照片")
                 return False, None, None
             
-            # 生成文件名（基于当前时间）
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"photo_{timestamp}.jpg"
-            filepath = os.path.join(self.output_dir, filename)
-            
-            # 添加水印
-            watermark_time = datetime.now().strftime("%Y/%m/%d %H:%M")
-            watermark_time_place = watermark_time + " Xi'An"
-            watermarked_frame = self._add_watermark(frame, watermark_time_place)
-            
-            # 保存带水印的原始照片
-            cv2.imwrite(filepath, watermarked_frame)
-            print(f"照片已保存: {filepath}")
+            filename = self._save_photo(frame)
             
             # 返回无水印的原始图像供后续对齐处理使用
             return True, frame, filename
             
         except Exception as e:
-            print(f"拍照过程中出现错误: {e}")
+            logger.error(f"拍照过程中出现错误: {e}")
             return False, None, None
+        finally:
+            if owns_camera and cap is not None:
+                cap.release()
+    
+    def _load_state(self):
+        """
+        从文件加载主体追踪状态
+        
+        Returns:
+            tuple: (眼睛中心, 几何签名)，文件不存在或缺少某项时对应为None
+        """
+        if not self.state_path or not os.path.exists(self.state_path):
+            return None, None
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except Exception as e:
+            logger.warning(f"主体追踪状态读取失败，将重新建立: {e}")
+            return None, None
+        eye_center = state.get('eye_center')
+        signature = state.get('signature')
+        return (None if eye_center is None else np.array(eye_center, dtype=np.float32),
+                None if signature is None else np.array(signature, dtype=np.float32))
+    
+    def _save_state(self):
+        """
+        保存主体追踪状态（调用方需持有 _state_lock）
+        """
+        if not self.state_path:
+            return
+        state = {}
+        if self._last_eye_center is not None:
+            state['eye_center'] = self._last_eye_center.tolist()
+        if self._subject_signature is not None:
+            state['signature'] = self._subject_signature.tolist()
+        try:
+            with open(self.state_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+        except Exception as e:
+            logger.warning(f"主体追踪状态保存失败: {e}")
     
     def detect_face_landmarks(self, image):
         """
-        检测人脸关键点
+        检测人脸关键点（单次推理检测多张人脸并选出拍摄主体，可被多个线程同时调用）
         
         Args:
             image: 输入图像
@@ -231,48 +332,45 @@ class TimeLapseCamera:
         Returns:
             dict: 包含关键点信息的字典
         """
-        # 确保MediaPipe已初始化
-        self._init_mediapipe()
-        
-        rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        results = self.face_mesh.process(rgb_image)
+        # 确保模型池已初始化
+        pool = self._init_mediapipe()
         
-        if not results.multi_face_landmarks:
-            return None
-        
-        # 获取第一个检测到的人脸
-        face_landmarks = results.multi_face_landmarks[0]
-        
-        # 转换关键点坐标
-        h, w, _ = image.shape
-        landmarks = []
-        for landmark in face_landmarks.landmark:
-            x = int(landmark.x * w)
-            y = int(landmark.y * h)
-            landmarks.append((x, y))
-        
-        # 获取重要的关键点
-        # 眼睛关键点
-        left_eye = landmarks[33]   # 左眼
-        right_eye = landmarks[263] # 右眼
-        # 鼻尖
-        nose_tip = landmarks[1]
-        # 嘴角
-        mouth_left = landmarks[61]
-        mouth_right = landmarks[291]
-        
-        return {
-            'all_landmarks': landmarks,
-            'left_eye': left_eye,
-            'right_eye': right_eye,
-            'nose_tip': nose_tip,
-            'mouth_left': mouth_left,
-            'mouth_right': mouth_right
-        }
+        with pool.models() as models:
+            faces = core.detect_faces(image, models.face_mesh)
+            if not faces:
+                return None
+            
+            # 选择拍摄主体
+            with self._state_lock:
+                index = core.select_subject(faces, self.subject, self._last_eye_center, self._subject_signature)
+            points = faces[index]
+            if len(faces) > 1:
+                logger.info(f"检测到{len(faces)}张人脸，按'{self.subject}'策略选择第{index + 1}张")
+            
+            quality = None
+            if self.quality_gate:
+                # 先用已提取的关键点检查姿态和大小，通过后才运行检测模型获取置信度
+                size = (image.shape[1], image.shape[0])
+                quality = core.face_quality(points, size, thresholds=self.quality_thresholds)
+                if quality['passed']:
+                    confidence = core.detection_confidence(image, models.face_detection, points)
+                    quality = core.face_quality(points, size, confidence, self.quality_thresholds)
+        
+        # 更新主体追踪状态（不合格的人脸不参与追踪）
+        if quality is None or quality['passed']:
+            with self._state_lock:
+                self._last_eye_center = core.eye_center(points)
+                if self.subject == "signature" and self._subject_signature is None:
+                    self._subject_signature = core.face_signature(points)
+                self._save_state()
+        
+        landmarks = core.landmarks_from_points(points, len(faces))
+        landmarks['quality'] = quality
+        return landmarks
     
-    def align_face(self, image, landmarks, target_size=(1920, 1080)):
+    def align_face(self, image, landmarks, target_size=core.DEFAULT_TARGET_SIZE):
         """
-        对齐人脸到固定位置（不缩放，只平移和旋转）
+        对齐人脸到固定位置（不缩放，只平移和旋转，见 timelapse_core.align）
         
         Args:
             image: 输入图像
@@ -282,43 +380,7 @@ class TimeLapseCamera:
         Returns:
             numpy.ndarray: 对齐后的图像
         """
-        if landmarks is None:
-            return None
-        
-        # 获取关键点
-        left_eye = np.array(landmarks['left_eye'])
-        right_eye = np.array(landmarks['right_eye'])
-        nose_tip = np.array(landmarks['nose_tip'])
-        
-        # 计算眼睛中心点
-        eye_center = (left_eye + right_eye) / 2
-        
-        # 计算眼睛之间的角度（用于旋转对齐）
-        eye_vector = right_eye - left_eye
-        angle = np.degrees(np.arctan2(eye_vector[1], eye_vector[0]))
-        
-        # 定义固定的目标位置（关键点应该对齐到的位置）
-        target_eye_center = np.array([target_size[0] / 2, target_size[1] * 0.4])  # 眼睛中心在图像上部40%处
-        
-        # 创建变换矩阵：只旋转，不缩放（scale=1.0）
-        rotation_matrix = cv2.getRotationMatrix2D(tuple(eye_center), angle, 1.0)
-        
-        # 计算平移量，将眼睛中心移动到目标位置
-        tx = target_eye_center[0] - eye_center[0]
-        ty = target_eye_center[1] - eye_center[1]
-        rotation_matrix[0, 2] += tx
-        rotation_matrix[1, 2] += ty
-        
-        # 应用变换，超出部分裁切，空白部分填充黑色
-        aligned_image = cv2.warpAffine(
-            image, 
-            rotation_matrix, 
-            target_size,
-            borderMode=cv2.BORDER_CONSTANT,  # 边界填充模式
-            borderValue=(0, 0, 0)            # 黑色填充
-        )
-        
-        return aligned_image
+        return core.align(image, landmarks, target_size)
     
     def process_photo(self, image, filename):
         """
@@ -336,14 +398,24 @@ class TimeLapseCamera:
             landmarks = self.detect_face_landmarks(image)
             
             if landmarks is None:
-                print("警告：未检测到人脸，跳过对齐处理")
+                logger.warning("警告：未检测到人脸，跳过对齐处理")
+                if self.quality_gate:
+                    self._append_quality_log(filename, 0, {'passed': False, 'reasons': ["未检测到人脸"]})
                 return False
             
+            # 质量不合格的照片在对齐和编码之前就跳过
+            quality = landmarks.get('quality')
+            if quality is not None:
+                self._append_quality_log(filename, landmarks['num_faces'], quality)
+                if not quality['passed']:
+                    logger.warning(f"⚠️ 人脸质量不合格，跳过对齐: {'，'.join(quality['reasons'])}")
+                    return False
+            
             # 对齐人脸
             aligned_image = self.align_face(image, landmarks)
             
             if aligned_image is None:
-                print("警告：人脸对齐失败")
+                logger.warning("警告：人脸对齐失败")
                 return False
             
             # 从文件名提取时间戳并格式化为水印格式
@@ -351,72 +423,256 @@ class TimeLapseCamera:
             try:
                 # 解析时间戳 20250926_143022 -> 2025/09/26 14:30
                 dt = datetime.strptime(timestamp_str, "%Y%m%d_%H%M%S")
-                watermark_time = dt.strftime("%Y/%m/%d %H:%M")
-            except:
+            except ValueError:
                 # 如果解析失败，使用当前时间
-                watermark_time = datetime.now().strftime("%Y/%m/%d %H:%M")
-            
-            # 添加地点信息到时间部分
-            watermark_time_place = watermark_time + " Xi'An"
+                dt = datetime.now()
             
-            # 为对齐图像添加水印
-            watermarked_aligned = self._add_watermark(aligned_image, watermark_time_place)
-            
-            # 保存带水印的对齐后图像
-            aligned_filename = f"aligned_{filename}"
-            aligned_filepath = os.path.join(self.aligned_dir, aligned_filename)
-            cv2.imwrite(aligned_filepath, watermarked_aligned)
-            print(f"对齐照片已保存: {aligned_filepath}")
+            # 为对齐图像添加水印并保存
+            watermarked_aligned = core.watermark(aligned_image, core.watermark_time(dt))
+            location = self.aligned_sink.write(filename, watermarked_aligned)
+            logger.info(f"对齐照片已保存: {location}")
             
             return True
             
         except Exception as e:
-            print(f"处理照片时出现错误: {e}")
+            logger.error(f"处理照片时出现错误: {e}")
             return False
     
     def take_daily_photo(self):
         """
         执行每日拍照流程（自动化完整流程）
         """
-        print("=== TimeLapse@Desk 自动拍照对齐 ===")
-        print(f"时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        logger.info("=== TimeLapse@Desk 自动拍照对齐 ===")
+        logger.info(f"时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         
         # 1. 拍摄照片
-        print("正在拍摄照片...")
+        logger.info("正在拍摄照片...")
         success, image, filename = self.capture_photo()
         
         if not success:
-            print("拍照失败，程序退出")
+            logger.error("拍照失败，程序退出")
             return False
         
         # 2. 自动进行人脸对齐处理
-        print("正在进行人脸对齐...")
+        logger.info("正在进行人脸对齐...")
         process_success = self.process_photo(image, filename)
         
         if process_success:
-            print("✅ 拍照和对齐完成！")
+            logger.info("✅ 拍照和对齐完成！")
         else:
-            print("⚠️ 人脸对齐失败，但原始照片已保存")
+            logger.warning("⚠️ 人脸对齐失败，但原始照片已保存")
         
-        print(f"📁 原始照片: {self.output_dir}")
-        print(f"📁 对齐照片: {self.aligned_dir}")
+        logger.info(f"📁 原始照片: {self.output_dir}")
+        logger.info(f"📁 对齐照片: {self.aligned_dir}")
         
         return True
 
+    def run_interval(self, interval, count=None, until=None, camera_index=0, align=True):
+        """
+        间隔连续拍摄模式：摄像头和人脸模型只初始化一次，
+        按单调时钟计划拍摄时间，不会因每次处理耗时而累积漂移
+        
+        Args:
+            interval: 拍摄间隔（秒）
+            count: 最多拍摄张数（None为不限）
+            until: 截止时间datetime（None为不限）
+            camera_index: 摄像头索引
+            align: 是否对每张照片进行人脸对齐
+            
+        Returns:
+            list: 每次拍摄的计划/实际时间记录
+        """
+        if interval < MIN_INTERVAL:
+            raise ValueError(f"拍摄间隔不能小于{MIN_INTERVAL:g}秒（照片文件名只精确到秒）")
+        
+        logger.info(f"=== TimeLapse@Desk 间隔拍摄模式（每{interval}秒） ===")
+        if until is not None:
+            if until <= datetime.now():
+                logger.error(f"截止时间 {until:%Y-%m-%d %H:%M:%S} 已经过去，不进行拍摄")
+                return []
+            logger.info(f"截止时间: {until:%Y-%m-%d %H:%M:%S}")
+        
+        cap = self.open_camera(camera_index)
+        if cap is None:
+            return []
+        if align:
+            # 预先加载模型，避免首张照片的计划时间被模型加载拖延
+            self._init_mediapipe(preload=True)
+        
+        # 计划时间基准：单调时钟用于调度，墙上时钟只用于记录
+        start_mono = time.monotonic()
+        start_wall = time.time()
+        until_mono = None
+        if until is not None:
+            until_mono = start_mono + (until - datetime.now()).total_seconds()
+        
+        os.makedirs(self.output_dir, exist_ok=True)
+        log_path = os.path.join(self.output_dir, "capture_log.csv")
+        records = []
+        slot = 0
+        
+        try:
+            while count is None or len(records) < count:
+                planned_mono = start_mono + slot * interval
+                if until_mono is not None and planned_mono > until_mono:
+                    break
+                
+                # 等待到计划时间
+                remaining = planned_mono - time.monotonic()
+                if remaining > 0:
+                    time.sleep(remaining)
+                
+                success, image, filename = self.capture_photo(cap=cap)
+                actual_mono = self.last_capture_time if success else time.monotonic()
+                
+                record = {
+                    'slot': slot,
+                    'planned': datetime.fromtimestamp(start_wall + slot * interval).isoformat(timespec='milliseconds'),
+                    'actual': datetime.fromtimestamp(start_wall + actual_mono - start_mono).isoformat(timespec='milliseconds'),
+                    'jitter_ms': round((actual_mono - planned_mono) * 1000, 1),
+                    'filename': filename or '',
+                    'aligned': False,
+                }
+                if success and align:
+                    record['aligned'] = self.process_photo(image, filename)
+                records.append(record)
+                self._append_capture_log(log_path, record)
+                logger.info(f"第{len(records)}张 计划 {record['planned']} 实际 {record['actual']} "
+                      f"偏差 {record['jitter_ms']:.1f} ms")
+                
+                # 下一个计划时间点；若处理耗时超过间隔，则跳过已错过的时间点
+                slot += 1
+                behind = time.monotonic() - (start_mono + slot * interval)
+                if behind > min(0.5, interval / 2):
+                    missed = int(behind // interval) + 1
+                    logger.warning(f"⚠️ 处理耗时超过间隔，跳过{missed}个拍摄时间点")
+                    slot += missed
+        except KeyboardInterrupt:
+            logger.info("\n已手动停止间隔拍摄")
+        finally:
+            cap.release()
+        
+        if records:
+            jitters = np.abs([r['jitter_ms'] for r in records])
+            logger.info(f"✅ 共拍摄{len(records)}张，时间偏差 平均 {jitters.mean():.1f} ms，最大 {jitters.max():.1f} ms")
+            logger.info(f"📄 拍摄时间记录: {log_path}")
+        
+        return records
+    
+    def _append_quality_log(self, filename, num_faces, quality):
+        """
+        追加一条人脸质量记录（JSON Lines，便于之后筛选被拒绝的照片）
+        """
+        record = {'time': datetime.now().isoformat(timespec='seconds'),
+                  'filename': filename, 'num_faces': num_faces}
+        record.update(quality)
+        line = json.dumps(record, ensure_ascii=False)
+        logger.debug(f"人脸质量: {line}")
+        if not self.quality_log_path:
+            return
+        try:
+            with self._quality_log_lock:
+                os.makedirs(os.path.dirname(self.quality_log_path) or ".", exist_ok=True)
+                with open(self.quality_log_path, 'a', encoding='utf-8') as f:
+                    f.write(line + "\n")
+        except OSError as e:
+            logger.warning(f"人脸质量记录写入失败: {e}")
+    
+    def _append_capture_log(self, log_path, record):
+        """
+        追加一条拍摄时间记录到CSV文件
+        """
+        write_header = not os.path.exists(log_path)
+        with open(log_path, 'a', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=list(record.keys()))
+            if write_header:
+                writer.writeheader()
+            writer.writerow(record)
+
+def parse_until(value):
+    """
+    解析截止时间参数，支持 "HH:MM" 或 "YYYY-MM-DD HH:MM"
+    只给出时刻且今天的该时刻已过时，视为明天的该时刻
+    """
+    for fmt in ("%Y-%m-%d %H:%M", "%Y-%m-%d %H:%M:%S"):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            pass
+    for fmt in ("%H:%M", "%H:%M:%S"):
+        try:
+            t = datetime.strptime(value, fmt).time()
+        except ValueError:
+            continue
+        now = datetime.now()
+        until = datetime.combine(now.date(), t)
+        return until if until > now else until + timedelta(days=1)
+    raise argparse.ArgumentTypeError(f"无法解析的截止时间: {value}")
+
 def main():
     """主函数 - 自动化拍照对齐流程"""
     parser = argparse.ArgumentParser(description='TimeLapse@Desk 自动拍照对齐程序')
     parser.add_argument('--camera', type=int, default=0, help='摄像头索引 (默认: 0)')
     parser.add_argument('--output', type=str, default='photos', help='原始照片保存目录')
     parser.add_argument('--aligned', type=str, default='aligned_photos', help='对齐照片保存目录')
+    parser.add_argument('--max-faces', type=int, default=3, help='单次推理最多检测的人脸数 (默认: 3)')
+    parser.add_argument('--subject', type=str, default='largest', choices=SUBJECT_STRATEGIES,
+                        help='多人脸时的主体选择策略: largest=最大人脸, nearest=最接近上次眼睛位置, signature=几何签名匹配')
+    parser.add_argument('--subject-signature', type=str, default=None,
+                        help='主体几何签名文件路径 (--subject signature 时必须指定，首次运行自动建立)')
+    parser.add_argument('--interval', type=float, default=None,
+                        help=f'间隔拍摄模式：每隔N秒拍摄一张，不小于{MIN_INTERVAL:g}秒（复用摄像头和人脸模型）')
+    parser.add_argument('--count', type=int, default=None, help='间隔拍摄模式下的拍摄张数')
+    parser.add_argument('--until', type=parse_until, default=None,
+                        help='间隔拍摄模式的截止时间 ("HH:MM" 或 "YYYY-MM-DD HH:MM")')
+    parser.add_argument('--no-quality-gate', action='store_true', help='关闭人脸质量检查（所有检测到人脸的照片都对齐）')
+    parser.add_argument('--min-confidence', type=float, default=core.QUALITY_THRESHOLDS['min_confidence'],
+                        help='最低人脸检测置信度 (默认: %(default)s)')
+    parser.add_argument('--max-yaw', type=float, default=core.QUALITY_THRESHOLDS['max_yaw'],
+                        help='最大偏航角（左右转头），单位度 (默认: %(default)s)')
+    parser.add_argument('--max-roll', type=float, default=core.QUALITY_THRESHOLDS['max_roll'],
+                        help='最大翻滚角（歪头），单位度 (默认: %(default)s)')
+    parser.add_argument('--face-ratio', type=float, nargs=2, metavar=('MIN', 'MAX'),
+                        default=(core.QUALITY_THRESHOLDS['min_face_ratio'], core.QUALITY_THRESHOLDS['max_face_ratio']),
+                        help='人脸宽度占画面宽度的比例范围 (默认: 0.08 0.8)')
+    
+    parser.add_argument('--quiet', action='store_true', help='静默模式：只输出警告和错误')
+    parser.add_argument('--log-level', type=str, default='INFO',
+                        choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], help='输出级别 (默认: INFO)')
     
     args = parser.parse_args()
+    setup_logging(args.log_level, args.quiet)
+    if (args.count is not None or args.until is not None) and args.interval is None:
+        parser.error("--count / --until 需要配合 --interval 使用")
+    if args.interval is not None and args.interval < MIN_INTERVAL:
+        parser.error(f"--interval 不能小于{MIN_INTERVAL:g}秒（照片文件名只精确到秒）")
+    if args.subject == "signature" and not args.subject_signature:
+        parser.error("--subject signature 需要配合 --subject-signature 指定签名文件")
     
-    # 创建TimeLapse相机实例
-    camera = TimeLapseCamera(args.output, args.aligned)
+    # 追踪状态保存到文件，任务计划程序每天单独启动时 nearest 策略也能延续上一次的位置
+    state_path = args.subject_signature or os.path.join(args.output, SUBJECT_STATE_NAME)
     
-    # 执行自动化拍照对齐流程
-    camera.take_daily_photo()
+    # 创建TimeLapse相机实例
+    with TimeLapseCamera(args.output, args.aligned,
+                         max_faces=args.max_faces,
+                         subject=args.subject,
+                         state_path=state_path,
+                         quality_gate=not args.no_quality_gate,
+                         quality_log_path=os.path.join(args.output, QUALITY_LOG_NAME),
+                         quality_thresholds={
+                             'min_confidence': args.min_confidence,
+                             'max_yaw': args.max_yaw,
+                             'max_roll': args.max_roll,
+                             'min_face_ratio': args.face_ratio[0],
+                             'max_face_ratio': args.face_ratio[1],
+                         }) as camera:
+        if args.interval is not None:
+            # 间隔连续拍摄
+            camera.run_interval(args.interval, count=args.count, until=args.until,
+                                camera_index=args.camera)
+        else:
+            # 执行自动化拍照对齐流程
+            camera.take_daily_photo()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file